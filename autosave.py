@@ -0,0 +1,106 @@
+import os
+import glob
+import queue
+import threading
+import config
+import save_format
+
+AUTOSAVE_PREFIX = "autosave_"
+AUTOSAVE_SUFFIX = ".gcs"
+
+# Фоновое автосохранение GameState
+# Снимок делается в игровом потоке (state.snapshot() -> (score, make_columns)),
+# сборка колонок, кодирование и атомарная запись - в рабочем потоке
+class Autosaver:
+    def __init__(self, directory=None, interval=None, retention=None, compress=None):
+        self.directory = directory if directory is not None else config.autosave_directory
+        self.interval = interval if interval is not None else config.autosave_interval
+        self.retention = max(1, retention if retention is not None else config.autosave_retention)
+        self.compress = compress if compress is not None else config.save_compress
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.sequence = self._last_sequence() + 1
+        self.timer = 0.0
+        self.last_error = None
+
+        # Не больше одного снимка в очереди: если диск не успевает, пропускаем автосохранение
+        self.queue = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self._worker, name="autosave", daemon=True)
+        self.thread.start()
+
+    # Sorted list of existing autosave files, oldest first
+    def list_saves(self):
+        pattern = os.path.join(self.directory, AUTOSAVE_PREFIX + "*" + AUTOSAVE_SUFFIX)
+        return sorted(glob.glob(pattern))
+
+    # Самое свежее автосохранение (или None)
+    def latest_save(self):
+        saves = self.list_saves()
+        return saves[-1] if saves else None
+
+    def _last_sequence(self):
+        last = 0
+        for path in self.list_saves():
+            name = os.path.basename(path)[len(AUTOSAVE_PREFIX):-len(AUTOSAVE_SUFFIX)]
+            if name.isdigit():
+                last = max(last, int(name))
+        return last
+
+    # Вызывается каждый кадр из GameState.update
+    def update(self, dt, state):
+        self.timer += dt
+        if self.timer < self.interval:
+            return False
+        self.timer = 0.0
+        return self.request(state)
+
+    # Снять снимок и поставить его в очередь на запись
+    def request(self, state):
+        if self.queue.full():
+            return False
+        try:
+            self.queue.put_nowait(state.snapshot())
+        except queue.Full:
+            return False
+        return True
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                score, make_columns = item
+                self._write(score, make_columns())
+            except Exception as e:
+                # Любая ошибка (в том числе из-за испорченного объекта) не должна
+                # останавливать поток, иначе очередь заполнится и автосохранение замолчит
+                self.last_error = e
+                print(f"Ошибка автосохранения: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, score, columns):
+        filename = os.path.join(self.directory, f"{AUTOSAVE_PREFIX}{self.sequence:06d}{AUTOSAVE_SUFFIX}")
+        self.sequence += 1
+        save_format.write_columns(filename, columns, score, self.compress)
+
+        # Удаляем старые автосохранения сверх лимита
+        for path in self.list_saves()[:-self.retention]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Дождаться завершения всех поставленных в очередь записей
+    def flush(self):
+        self.queue.join()
+
+    # Остановить рабочий поток (после записи ожидающего снимка)
+    # Ожидание ограничено timeout секунд, чтобы зависшая запись не блокировала выход из игры
+    def stop(self, timeout=5.0):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            print("Автосохранение: рабочий поток не отвечает, останавливаем без ожидания")
+        self.thread.join(timeout)
@@ -0,0 +1,182 @@
+import os
+import sys
+import tempfile
+import time
+import random
+
+# Бенчмарки производительности
+# Запуск: python benchmark.py [имя бенчмарка ...]
+# Offscreen-рендер: BENCHMARK_GL_BACKEND=egl - без дисплея, BENCHMARK_DUMP_DIR=путь - сохранить кадры
+
+# Measure a callable, returning the best time of several runs
+def measure(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+# Сохранение/загрузка GameState: JSON против бинарного формата
+def bench_save_load(count=100000):
+    from game_state import GameState
+
+    state = GameState()
+    state.cubes.clear()
+    for i in range(count):
+        position = [random.uniform(-15, 15), random.uniform(-10, 10)]
+        if i % 10 == 0:
+            state.create_collectible(position)
+        else:
+            state.create_cube(position, [random.uniform(-1, 1), 0.0], random.uniform(0.3, 1.5))
+
+    print(f"Save/load, {count} objects:")
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = [
+            ('json', os.path.join(tmp, 'save.txt'), {'binary': False}),
+            ('binary', os.path.join(tmp, 'save.gcs'), {'binary': True}),
+        ]
+        for name, path, kwargs in variants:
+            save_time = measure(lambda: state.save_state(path, **kwargs))
+            load_time = measure(lambda: state.load_state(path))
+            size_kb = os.path.getsize(path) / 1024
+            print(f"  {name:8s} save {save_time * 1000:8.1f} ms  load {load_time * 1000:8.1f} ms  size {size_kb:8.0f} KB")
+
+        # Загрузка бинарного файла сразу в массивы, без словарей
+        import save_format
+        columns_time = measure(lambda: save_format.read_columns(variants[1][1]))
+        print(f"  {'columns':8s} load {columns_time * 1000:8.1f} ms")
+
+# Шаг физики GameState: Python против Taichi
+def bench_physics(count=500, steps=50, dt=1.0 / 60.0):
+    import config
+    import game_state
+
+    config.init_taichi()
+    print(f"Physics update, {count} cubes, {steps} steps:")
+    for backend in ('python', 'taichi'):
+        random.seed(0)
+        state = game_state.create_game_state(backend, autosave=False)
+        for _ in range(count):
+            state.create_cube([random.uniform(-14, 14), random.uniform(-9, 20)], size=random.uniform(0.3, 1.0))
+
+        # Первый шаг компилирует ядра Taichi - не учитываем его
+        state.update(dt)
+        state.game_over = False
+
+        def run():
+            for _ in range(steps):
+                state.update(dt)
+        elapsed = measure(run, repeat=1)
+        print(f"  {backend:8s} {elapsed / steps * 1000:8.2f} ms/step")
+
+# Обновление ParticleSystem: стоимость шага при заполненном буфере
+def bench_particles(count=32768, steps=100, dt=1.0 / 60.0):
+    from rendering import ParticleSystem
+
+    system = ParticleSystem(None, max_particles=count)
+    print(f"Particle update, {count} particles, {steps} steps:")
+
+    def emit():
+        for _ in range(count // 10):
+            system.emit_particles((random.uniform(-10, 10), random.uniform(-5, 5)), (0.8, 0.4, 0.2), 10)
+
+    # Пустой буфер, затем заполненный: при переполнении emit вытесняет самые старые частицы
+    system.clear()
+    emit_time = measure(emit, repeat=1)
+    print(f"  {'emit':8s} {emit_time / (count // 10) * 1e6:8.2f} us/call (10 particles, empty buffer)")
+    emit_time = measure(emit, repeat=1)
+    print(f"  {'emit':8s} {emit_time / (count // 10) * 1e6:8.2f} us/call (10 particles, full buffer, "
+          f"{system.alive_count} alive)")
+
+    def run():
+        for _ in range(steps):
+            system.update(dt)
+            # Поддерживаем буфер заполненным, как при непрерывных столкновениях
+            system.emit_particles((0.0, 0.0), (0.8, 0.4, 0.2), count // steps)
+    elapsed = measure(run, repeat=1)
+    print(f"  {'update':8s} {elapsed / steps * 1000:8.2f} ms/step ({system.alive_count} alive)")
+
+# Записываем кадр (H, W, 3) uint8 в файл PPM (без сторонних зависимостей)
+def write_ppm(filename, frame):
+    height, width, _ = frame.shape
+    with open(filename, 'wb') as f:
+        f.write(f"P6 {width} {height} 255\n".encode('ascii'))
+        f.write(frame.tobytes())
+
+# Offscreen-сцена Renderer: N кубов и M частиц без окна
+# Кадры сохраняются в dump_dir (или $BENCHMARK_DUMP_DIR), если он задан
+def bench_render(cubes=2000, particles=20000, frames=120, width=800, height=600, dt=1.0 / 60.0,
+                 dump_dir=None, backend=None):
+    import numpy as np
+    from rendering import Renderer, ParticleSystem
+
+    dump_dir = dump_dir or os.environ.get('BENCHMARK_DUMP_DIR')
+    backend = backend or os.environ.get('BENCHMARK_GL_BACKEND')
+    renderer = Renderer.offscreen(width, height, backend=backend)
+    renderer.particle_system = ParticleSystem(renderer, max_particles=particles)
+
+    # Фиксированная сцена, чтобы кадры можно было сравнивать между запусками
+    rng = np.random.default_rng(0)
+    positions = np.zeros((cubes, 3), dtype='f4')
+    positions[:, 0] = rng.uniform(-3.0, 3.0, cubes)
+    positions[:, 1] = rng.uniform(-2.0, 2.0, cubes)
+    positions[:, 2] = rng.uniform(-4.0, 0.0, cubes)
+    scales = rng.uniform(0.05, 0.2, cubes).astype('f4')[:, None].repeat(3, axis=1)
+    colors = rng.uniform(0.2, 1.0, (cubes, 3)).astype('f4')
+    renderer.particle_system.rng = np.random.default_rng(1)
+
+    if dump_dir:
+        os.makedirs(dump_dir, exist_ok=True)
+
+    print(f"Offscreen render, {cubes} cubes, {particles} particles, {frames} frames ({width}x{height}):")
+    submit_ms = 0.0
+    frame_ms = 0.0
+    draw_calls = 0
+    try:
+        for frame in range(frames):
+            # Поддерживаем буфер частиц заполненным
+            renderer.particle_system.emit_particles((0.0, 0.0), (1.0, 0.6, 0.2), max(1, particles // 30))
+
+            start = time.perf_counter()
+            renderer.reset_render_stats()
+            renderer.update(dt)
+            renderer.clear_screen()
+            renderer.draw_instances(positions, scales, colors)
+            renderer.particle_system.render()
+            renderer.flush_render_queue()
+            stats = renderer.get_render_stats()
+            # Ждем GPU, чтобы время кадра включало отрисовку
+            renderer.ctx.finish()
+            frame_ms += (time.perf_counter() - start) * 1000
+            submit_ms += stats['submit_ms']
+            draw_calls += stats['draw_calls']
+
+            if dump_dir:
+                write_ppm(os.path.join(dump_dir, f"frame_{frame:05d}.ppm"), renderer.read_frame())
+    finally:
+        renderer.release()
+
+    print(f"  {'submit':8s} {submit_ms / frames:8.3f} ms/frame (CPU)")
+    print(f"  {'frame':8s} {frame_ms / frames:8.3f} ms/frame ({draw_calls / frames:.1f} draw calls)")
+
+BENCHMARKS = {
+    'save_load': bench_save_load,
+    'physics': bench_physics,
+    'particles': bench_particles,
+    'render': bench_render,
+}
+
+def main(argv):
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (available: {', '.join(BENCHMARKS)})")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
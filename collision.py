@@ -1,44 +1,276 @@
 import config
 import numpy as np
+from wall_grid import WallGrid, NO_WALL, FIELD_WALL
+from wall_sdf import WallSDF
+
+_wall_grid = None
+_wall_sdf = None
+
+# Перестроить структуры стен из config.inner_wall_data и границ поля
+# Вызывать при загрузке уровня и после любого изменения стен или размеров поля:
+# запросы используют закэшированную сетку и сами изменения не отслеживают
+def rebuild_wall_grid():
+    global _wall_grid, _wall_sdf
+    walls = np.asarray(config.inner_wall_data[:config.num_inner_walls], dtype=np.float32)
+    _wall_grid = WallGrid(walls, config.wall_thickness, config.field_width, config.field_height,
+                          cell_size=config.wall_grid_cell_size)
+    _wall_sdf = None
+    if config.wall_sdf_enabled:
+        get_wall_sdf()
+    return _wall_grid
+
+# Grid over the current walls (built by rebuild_wall_grid)
+def get_wall_grid():
+    if _wall_grid is None:
+        return rebuild_wall_grid()
+    return _wall_grid
+
+# Signed distance field of the walls, baked once per level (reset by rebuild_wall_grid)
+# Запекается из той же геометрии, что и у check/sweep: sweep_boxes стен, которые check может задеть
+def get_wall_sdf():
+    global _wall_sdf
+    if _wall_sdf is None:
+        grid = get_wall_grid()
+        field_bounds = (grid.field_min_x, grid.field_min_y, grid.field_max_x, grid.field_max_y)
+        _wall_sdf = WallSDF(grid.sweep_boxes[grid.sweepable], field_bounds, config.wall_sdf_resolution)
+    return _wall_sdf
+
+# Расстояние до ближайшей стены и градиент (направление выталкивания) для позиций (N, 2)
+def sample_wall_sdf(positions):
+    return get_wall_sdf().sample(positions)
+
+# Приближенная проверка через SDF: куб считается кругом радиуса size / 2
+def check_collision_sdf(positions, sizes):
+    distances, _ = sample_wall_sdf(positions)
+    return distances < np.asarray(sizes, dtype=np.float32) / 2
+
+# Вытолкнуть кубы (N, 2) из стен вдоль градиента SDF
+def push_out_sdf(positions, sizes):
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+    distances, gradients = sample_wall_sdf(positions)
+    depth = np.maximum(np.asarray(sizes, dtype=np.float32) / 2 - distances, 0.0)
+    norm = np.maximum(np.linalg.norm(gradients, axis=1), 1e-6)
+    return positions + gradients * (depth / norm)[:, None]
 
 # Функция для проверки столкновения куба со стенами
 def check_collision(pos, size):
-    # Вычисляем границы поля
-    field_min_x = (1.0 - config.field_width) / 2.0
-    field_max_x = field_min_x + config.field_width
-    field_min_y = (1.0 - config.field_height) / 2.0
-    field_max_y = field_min_y + config.field_height
-    
-    # Границы куба
-    cube_min_x = pos[0] - size / 2
-    cube_max_x = pos[0] + size / 2
-    cube_min_y = pos[1] - size / 2
-    cube_max_y = pos[1] + size / 2
+    return get_wall_grid().check(float(pos[0]), float(pos[1]), float(size))
+
+# Максимум элементов в промежуточных массивах (запросы x стены) за один проход
+BATCH_CELLS = 1 << 20
+
+# Пакетная проверка столкновений для многих позиций
+# positions - массив (N, 2), sizes - массив (N,) или число
+# Возвращает флаги столкновений bool (N,) и id первой задетой стены int32 (N,):
+# индекс в config.inner_wall_data, FIELD_WALL для границы поля или NO_WALL
+def check_collision_batch(positions, sizes):
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float32), positions.shape[:1])
+    count = len(positions)
+    
+    # Границы поля берем из предвычисленной структуры
+    grid = get_wall_grid()
+    
+    half = sizes / 2
+    cube_min_x = positions[:, 0] - half
+    cube_max_x = positions[:, 0] + half
+    cube_min_y = positions[:, 1] - half
+    cube_max_y = positions[:, 1] + half
     
     # Проверка столкновения с внешними стенами
-    if (cube_min_x <= field_min_x or cube_max_x >= field_max_x or 
-        cube_min_y <= field_min_y or cube_max_y >= field_max_y):
-        return True
-    
-    # Проверка столкновения с внутренними стенами
-    for i in range(config.num_inner_walls):
-        wall = config.inner_wall_data[i]
-        wx1, wy1, wx2, wy2 = wall[0], wall[1], wall[2], wall[3]
+    field_hits = ((cube_min_x <= grid.field_min_x) | (cube_max_x >= grid.field_max_x) |
+                  (cube_min_y <= grid.field_min_y) | (cube_max_y >= grid.field_max_y))
+    wall_ids = np.where(field_hits, FIELD_WALL, NO_WALL).astype(np.int32)
+    
+    walls = grid.walls
+    if len(walls) == 0 or count == 0:
+        return field_hits, wall_ids
+    
+    wx1, wy1, wx2, wy2 = walls[:, 0], walls[:, 1], walls[:, 2], walls[:, 3]
+    thickness = grid.thickness
+    wall_min_y = np.minimum(wy1, wy2) - thickness/2
+    wall_max_y = np.maximum(wy1, wy2) + thickness/2
+    vertical = np.abs(wx1 - wx2) < thickness
+    horizontal = np.abs(wy1 - wy2) < thickness
+    
+    # Проверка столкновения с внутренними стенами блоками по (n, W), чтобы ограничить память
+    # (внешняя граница проверяется первой, как в check_collision)
+    step = max(1, BATCH_CELLS // len(walls))
+    for begin in range(0, count, step):
+        rows = slice(begin, begin + step)
+        min_x = cube_min_x[rows, None]
+        max_x = cube_max_x[rows, None]
+        min_y = cube_min_y[rows, None]
+        max_y = cube_max_y[rows, None]
         
-        # Проверяем только если стена и куб пересекаются
-        if ((wx1 <= cube_max_x and wx2 >= cube_min_x) and 
-            (min(wy1, wy2) - config.wall_thickness/2 <= cube_max_y and max(wy1, wy2) + config.wall_thickness/2 >= cube_min_y)):
-            
-            # Вертикальная стена
-            if abs(wx1 - wx2) < config.wall_thickness:
-                wall_x = wx1
-                if abs(cube_min_x - wall_x) < config.wall_thickness or abs(cube_max_x - wall_x) < config.wall_thickness:
-                    return True
-                    
-            # Горизонтальная стена
-            if abs(wy1 - wy2) < config.wall_thickness:
-                wall_y = wy1
-                if abs(cube_min_y - wall_y) < config.wall_thickness or abs(cube_max_y - wall_y) < config.wall_thickness:
-                    return True
-    
-    return False 
\ No newline at end of file
+        near = (wx1 <= max_x) & (wx2 >= min_x) & (wall_min_y <= max_y) & (wall_max_y >= min_y)
+        vertical_hit = (np.abs(min_x - wx1) < thickness) | (np.abs(max_x - wx1) < thickness)
+        horizontal_hit = (np.abs(min_y - wy1) < thickness) | (np.abs(max_y - wy1) < thickness)
+        wall_hits = near & ((vertical & vertical_hit) | (horizontal & horizontal_hit))
+        
+        inner = wall_hits.any(axis=1) & ~field_hits[rows]
+        wall_ids[rows] = np.where(inner, wall_hits.argmax(axis=1), wall_ids[rows])
+    
+    return wall_ids != NO_WALL, wall_ids
+
+# Пакетная проверка столкновений для нескольких кубов
+# positions - массив (N, 2), sizes - массив (N,); возвращает массив bool (N,)
+def check_collision_many(positions, sizes):
+    return check_collision_batch(positions, sizes)[0]
+
+# Зазор, на котором движущийся куб останавливается перед стеной
+CONTACT_SKIN = 1e-4
+
+# Нормали граней прямоугольника: min_x, max_x, min_y, max_y
+FACE_NORMALS = np.array([[-1.0, 0.0], [1.0, 0.0], [0.0, -1.0], [0.0, 1.0]], dtype=np.float32)
+
+# Slab test of centres p (n, 1) moving by d (n, 1) against intervals [lo, hi] (n, C)
+# Returns entry and exit times (n, C); without motion along the axis the interval is all or nothing
+def _slab(p, d, lo, hi):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t0 = (lo - p) / d
+        t1 = (hi - p) / d
+    still = d == 0.0
+    inside = (p > lo) & (p < hi)
+    t_near = np.where(still, np.where(inside, -np.inf, np.inf), np.minimum(t0, t1))
+    t_far = np.where(still, np.where(inside, np.inf, -np.inf), np.maximum(t0, t1))
+    return t_near, t_far
+
+# Swept test of cube centres (n,) against wall boxes (C, 4) expanded by pad (n,) (сумма Минковского)
+# Returns time of impact (n, C) (inf - нет контакта) and contact normals nx, ny (n, C)
+def _sweep_boxes(x, y, dx, dy, pad, boxes):
+    x, y, dx, dy, pad = x[:, None], y[:, None], dx[:, None], dy[:, None], pad[:, None]
+    lo_x, hi_x = boxes[:, 0] - pad, boxes[:, 2] + pad
+    lo_y, hi_y = boxes[:, 1] - pad, boxes[:, 3] + pad
+    
+    near_x, far_x = _slab(x, dx, lo_x, hi_x)
+    near_y, far_y = _slab(y, dy, lo_y, hi_y)
+    t_enter = np.maximum(near_x, near_y)
+    t_exit = np.minimum(far_x, far_y)
+    hit = (t_enter < t_exit) & (t_enter <= 1.0) & (t_exit > 0.0)
+    
+    # Нормаль входа - по оси, по которой куб входит в прямоугольник последней
+    y_axis = near_y > near_x
+    nx = np.where(y_axis, 0.0, np.where(dx > 0.0, -1.0, 1.0))
+    ny = np.where(y_axis, np.where(dy > 0.0, -1.0, 1.0), 0.0)
+    entering = hit & (t_enter >= 0.0)
+    
+    # Уже внутри (например, из-за округления у границы): нормаль - ближайшая грань,
+    # блокируем только движение глубже в стену
+    faces = np.stack(np.broadcast_arrays(x - lo_x, hi_x - x, y - lo_y, hi_y - y), axis=-1)
+    face_normals = FACE_NORMALS[faces.argmin(axis=-1)]
+    deeper = hit & ~entering & (dx * face_normals[..., 0] + dy * face_normals[..., 1] < 0.0)
+    
+    toi = np.where(entering, t_enter, np.where(deeper, 0.0, np.inf))
+    nx = np.where(entering, nx, face_normals[..., 0])
+    ny = np.where(entering, ny, face_normals[..., 1])
+    return toi, nx, ny
+
+# Пакетная swept-проверка: кубы positions (N, 2) размера sizes сдвигаются на deltas (N, 2) или (2,)
+# Стены берутся в той же геометрии, что и в check_collision, поэтому куб, остановленный
+# перед стеной, не дает столкновения в статической проверке
+# Returns toi (N,): доля пути до первого контакта (1.0 - путь свободен),
+# normals (N, 2) и wall_ids (N,) (как в check_collision_batch)
+def sweep_collision_batch(positions, sizes, deltas):
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float32), positions.shape[:1])
+    deltas = np.broadcast_to(np.asarray(deltas, dtype=np.float32).reshape(-1, 2), positions.shape)
+    count = len(positions)
+    grid = get_wall_grid()
+    
+    x, y = positions[:, 0], positions[:, 1]
+    dx, dy = deltas[:, 0], deltas[:, 1]
+    pad = sizes / 2 + CONTACT_SKIN
+    
+    toi = np.ones(count, dtype=np.float32)
+    normals = np.zeros((count, 2), dtype=np.float32)
+    wall_ids = np.full(count, NO_WALL, dtype=np.int32)
+    
+    # Граница поля: центр куба должен оставаться внутри поля, уменьшенного на полкуба и зазор
+    for axis, lo, hi in ((0, grid.field_min_x + pad, grid.field_max_x - pad),
+                         (1, grid.field_min_y + pad, grid.field_max_y - pad)):
+        p, d = positions[:, axis], deltas[:, axis]
+        low = (d < 0.0) & (p + d < lo)
+        high = (d > 0.0) & (p + d > hi)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(low, (lo - p) / d, np.where(high, (hi - p) / d, np.inf))
+        t = np.maximum(t, 0.0)
+        closer = t < toi
+        toi[closer] = t[closer]
+        wall_ids[closer] = FIELD_WALL
+        normals[closer] = 0.0
+        normals[closer, axis] = np.where(low, 1.0, -1.0)[closer]
+    
+    if count == 0 or len(grid.walls) == 0:
+        return toi, normals, wall_ids
+    
+    # Внутренние стены: только из ячеек, которые задевают пути всех кубов
+    candidates = np.asarray(grid.candidates(float((np.minimum(x, x + dx) - pad).min()),
+                                            float((np.minimum(y, y + dy) - pad).min()),
+                                            float((np.maximum(x, x + dx) + pad).max()),
+                                            float((np.maximum(y, y + dy) + pad).max())), dtype=np.int32)
+    candidates = candidates[grid.sweepable[candidates]]
+    if len(candidates) == 0:
+        return toi, normals, wall_ids
+    boxes = grid.sweep_boxes[candidates]
+    
+    # Блоками по (n, C), чтобы ограничить память
+    step = max(1, BATCH_CELLS // len(candidates))
+    for begin in range(0, count, step):
+        rows = slice(begin, begin + step)
+        t, nx, ny = _sweep_boxes(x[rows], y[rows], dx[rows], dy[rows], pad[rows], boxes)
+        first = t.argmin(axis=1)
+        picked = np.arange(len(first))
+        t_first = t[picked, first]
+        
+        closer = t_first < toi[rows]
+        block = np.flatnonzero(closer) + begin
+        toi[block] = t_first[closer]
+        normals[block, 0] = nx[picked, first][closer]
+        normals[block, 1] = ny[picked, first][closer]
+        wall_ids[block] = candidates[first[closer]]
+    
+    return toi, normals, wall_ids
+
+# Swept-проверка движения одного куба на delta
+# Returns (toi, normal, wall_id), см. sweep_collision_batch
+def sweep_collision(pos, size, delta):
+    toi, normals, wall_ids = sweep_collision_batch([pos], [size], delta)
+    return float(toi[0]), normals[0], int(wall_ids[0])
+
+# Движение со скольжением для многих кубов сразу: куб доходит до стены,
+# остаток пути проецируется на стену; на каждом шаге - одна пакетная swept-проверка
+# Returns (new_positions (N, 2), blocked (N,))
+def move_and_slide_batch(positions, sizes, deltas, max_slides=2):
+    positions = np.array(positions, dtype=np.float32).reshape(-1, 2)
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float32), positions.shape[:1])
+    deltas = np.array(np.broadcast_to(np.asarray(deltas, dtype=np.float32).reshape(-1, 2), positions.shape))
+    blocked = np.zeros(len(positions), dtype=bool)
+    moving = deltas.any(axis=1)
+    
+    for _ in range(max_slides + 1):
+        indices = np.flatnonzero(moving)
+        if len(indices) == 0:
+            break
+        toi, normals, wall_ids = sweep_collision_batch(positions[indices], sizes[indices], deltas[indices])
+        positions[indices] += deltas[indices] * toi[:, None]
+        hit = wall_ids != NO_WALL
+        blocked[indices[hit]] = True
+        
+        # Остаток пути без составляющей вдоль нормали
+        rest = deltas[indices] * (1.0 - toi)[:, None]
+        rest -= (rest * normals).sum(axis=1)[:, None] * normals
+        rest[~hit] = 0.0
+        deltas[indices] = rest
+        moving[indices] = rest.any(axis=1)
+    
+    return positions, blocked
+
+# Движение со скольжением для одного куба
+# Returns (new_position, blocked)
+def move_and_slide(pos, size, delta, max_slides=2):
+    positions, blocked = move_and_slide_batch([pos], [size], delta, max_slides)
+    return positions[0], bool(blocked[0])
+
+# Строим структуры сразу при загрузке уровня из config
+rebuild_wall_grid()
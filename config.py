@@ -28,11 +28,14 @@ gravity_strength = 9.8
 inertia_enabled = True
 friction = 0.98
 bounce_factor = 0.7
+physics_backend = "python"  # Бэкенд GameState: "python" или "taichi"
+taichi_max_objects = 4096  # Емкость полей Taichi-бэкенда
 
 # Эффекты частиц
 particles_enabled = True
 particles_count = 10
 particles_lifetime = 1.0
+particles_max_count = 32768  # Емкость буфера частиц ParticleSystem
 
 # Cube movement speed
 move_speed = 0.01
@@ -90,6 +93,7 @@ target_zones = [
     [0.7, 0.2, 0.1]  # x, y, radius
 ]
 target_zone_color = ti.Vector([0.2, 0.9, 0.2])  # Green
+target_zone_index_min_zones = 16  # С этого числа зон запросы идут через сеточный индекс
 
 # Game settings
 count_steps = True
@@ -103,6 +107,18 @@ inner_wall_data = np.array([
     [0.3, 0.5, 0.5, 0.5],   # horizontal wall center
 ], dtype=np.float32)
 num_inner_walls = len(inner_wall_data)
+wall_grid_cell_size = None  # Размер ячейки сетки стен (None - медианная длина стены)
+wall_sdf_enabled = False  # Запекать поле расстояний стен при загрузке уровня
+wall_sdf_resolution = 256  # Узлов SDF по каждой оси
+
+# Запись кадров (FrameCapture)
+capture_directory = "captures"  # Каждая запись - в своей подпапке с меткой времени
+capture_format = "png"  # "png" (последовательность), "raw" (RGB24) или "gif" (нужен Pillow)
+capture_pool_size = 8  # Буферов кадров: больше кадров в очереди - пропуск
+capture_workers = 2  # Потоков кодирования
+capture_fps = 30  # Частота кадров для GIF и имени raw-файла
+capture_png_level = 1  # Уровень сжатия zlib для PNG
+capture_gif_max_frames = 150  # GIF собирается в памяти: дальше кадры пропускаются
 
 # Sound settings
 sound_enabled = True
@@ -110,6 +126,16 @@ music_enabled = True
 sound_volume = 0.7
 music_volume = 0.3
 
+# Очередь звуковых событий
+sound_max_events = 4  # Максимум звуков за кадр (самые громкие)
+sound_min_intervals = {  # Минимальный интервал между звуками одного типа, секунды
+    'collision': 0.05,
+    'create_cube': 0.05,
+    'collectible': 0.03
+}
+sound_min_impact = 0.5  # Удары слабее этого (лежащие друг на друге кубы) не озвучиваются
+sound_full_impact = 10.0  # Скорость удара, соответствующая полной громкости
+
 # Spawner and target settings
 spawner_locations = [
     [0.2, 0.2],
@@ -128,6 +154,14 @@ target_size = 0.05
 # Сохранение и загрузка
 save_directory = "./"  # Директория для сохранения игры
 default_save_file = "save.txt"
+save_binary = False  # Бинарный формат вместо JSON
+save_compress = True  # Сжимать бинарные сохранения (zlib)
+# Периодическое автосохранение GameState в фоне; включено по умолчанию и создает
+# autosave_directory в рабочей директории (отключить: autosave_enabled = False)
+autosave_enabled = True
+autosave_interval = 60.0  # seconds
+autosave_retention = 3  # Сколько последних автосохранений хранить
+autosave_directory = "autosaves"
 level_files = [
     "level1.txt",
     "level2.txt",
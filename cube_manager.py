@@ -4,10 +4,11 @@ import config
 import sound
 import game_state
 import random
+from zone_index import ZoneIndex, query_zones, zone_occupancy
 from config import *
 
-# Maximum number of cubes
-max_cubes = 5
+# Current cube capacity (starts at config.max_cubes, grows 2x on demand)
+max_cubes = config.max_cubes
 
 # Физические константы для CubeManager
 GRAVITY = 9.8
@@ -24,110 +25,342 @@ cube_count = None
 last_positions = None  # For tracking collisions and speed
 cube_steps = None      # Step counter for each cube
 
+# Кэш выбора: индекс активного куба и множество выбранных кубов (включает активный)
+# Обновляется при добавлении, удалении и выборе, чтобы не сканировать cube_active
+active_index = -1
+selection = set()
+
+# Allocate per-cube fields of the given capacity
+def allocate_cube_fields(capacity):
+    return (
+        ti.Vector.field(2, dtype=ti.f32, shape=capacity),  # positions
+        ti.Vector.field(3, dtype=ti.f32, shape=capacity),  # colors
+        ti.field(dtype=ti.f32, shape=capacity),            # sizes
+        ti.field(dtype=ti.i32, shape=capacity),            # active
+        ti.Vector.field(2, dtype=ti.f32, shape=capacity),  # last positions
+        ti.field(dtype=ti.i32, shape=capacity)             # steps
+    )
+
+# Current per-cube fields, in the order the kernels take them
+# Поля передаются в ядра как template-аргументы: после перевыделения
+# ядра перекомпилируются под новые поля, а не пишут в старые
+def cube_fields():
+    return cube_positions, cube_colors, cube_sizes, cube_active, last_positions, cube_steps
+
 # Cube fields initialization
-def init():
-    global cube_positions, cube_colors, cube_sizes, cube_active, cube_count, last_positions, cube_steps
+def init(capacity=None):
+    global cube_positions, cube_colors, cube_sizes, cube_active, cube_count, last_positions, cube_steps, max_cubes
+    
+    if capacity is not None:
+        max_cubes = capacity
     
     # Initialize fields for storing cube data
-    cube_positions = ti.Vector.field(2, dtype=ti.f32, shape=max_cubes)
-    cube_colors = ti.Vector.field(3, dtype=ti.f32, shape=max_cubes)
-    cube_sizes = ti.field(dtype=ti.f32, shape=max_cubes)
-    cube_active = ti.field(dtype=ti.i32, shape=max_cubes)
+    (cube_positions, cube_colors, cube_sizes,
+     cube_active, last_positions, cube_steps) = allocate_cube_fields(max_cubes)
     cube_count = ti.field(dtype=ti.i32, shape=())
-    last_positions = ti.Vector.field(2, dtype=ti.f32, shape=max_cubes)
-    cube_steps = ti.field(dtype=ti.i32, shape=max_cubes)
+    set_active_cache(-1)
 
-# First cube initialization
+# Copy all cube state into larger fields (single kernel) and resync the counter
 @ti.kernel
-def init_first_cube():
+def _copy_cubes(positions: ti.template(), colors: ti.template(), sizes: ti.template(),
+                active: ti.template(), last: ti.template(), steps: ti.template(),
+                new_positions: ti.template(), new_colors: ti.template(), new_sizes: ti.template(),
+                new_active: ti.template(), new_last: ti.template(), new_steps: ti.template(),
+                count: ti.i32):
+    for i in range(count):
+        new_positions[i] = positions[i]
+        new_colors[i] = colors[i]
+        new_sizes[i] = sizes[i]
+        new_active[i] = active[i]
+        new_last[i] = last[i]
+        new_steps[i] = steps[i]
+    cube_count[None] = count
+
+# Grow capacity 2x (or more, up to min_capacity), keeping existing cubes
+def grow(min_capacity=None):
+    global cube_positions, cube_colors, cube_sizes, cube_active, last_positions, cube_steps, max_cubes
+    
+    new_capacity = max(max_cubes * 2, 1)
+    if min_capacity is not None:
+        while new_capacity < min_capacity:
+            new_capacity *= 2
+    
+    new_fields = allocate_cube_fields(new_capacity)
+    _copy_cubes(*cube_fields(), *new_fields, cube_count[None])
+    
+    (cube_positions, cube_colors, cube_sizes,
+     cube_active, last_positions, cube_steps) = new_fields
+    max_cubes = new_capacity
+
+# Make sure there is room for at least `capacity` cubes
+def ensure_capacity(capacity):
+    if capacity > max_cubes:
+        grow(capacity)
+
+@ti.kernel
+def _init_first_cube(positions: ti.template(), colors: ti.template(), sizes: ti.template(),
+                     active: ti.template(), last: ti.template(), steps: ti.template()):
     # Create first cube in the center
-    cube_positions[0] = ti.Vector([0.5, 0.5])
-    cube_colors[0] = ti.Vector([config.default_cube_color[0], 
-                               config.default_cube_color[1], 
-                               config.default_cube_color[2]])
-    cube_sizes[0] = config.default_cube_size
-    cube_active[0] = 1  # 1 = active, 0 = inactive
-    last_positions[0] = cube_positions[0]
-    cube_steps[0] = 0
+    positions[0] = ti.Vector([0.5, 0.5])
+    colors[0] = ti.Vector([config.default_cube_color[0], 
+                           config.default_cube_color[1], 
+                           config.default_cube_color[2]])
+    sizes[0] = config.default_cube_size
+    active[0] = 1  # 1 = active, 0 = inactive
+    last[0] = positions[0]
+    steps[0] = 0
     cube_count[None] = 1
 
-# Function for determining the active cube
-def get_active_cube_index():
-    # Find the active cube
+# First cube initialization
+def init_first_cube():
+    _init_first_cube(*cube_fields())
+    set_active_cache(0)
+
+# Field operations as kernels: one runtime call instead of per-element access from Python
+
+@ti.kernel
+def _deactivate_all(active: ti.template()):
+    for i in range(cube_count[None]):
+        active[i] = 0
+
+# Deactivate all cubes
+def deactivate_all_cubes():
+    _deactivate_all(cube_active)
+    set_active_cache(-1)
+
+@ti.kernel
+def _select(active: ti.template(), index: ti.i32):
     for i in range(cube_count[None]):
-        if cube_active[i] == 1:
-            return i
-    return -1  # If no active cube
+        active[i] = 1 if i == index else 0
+
+# Make one cube active and all others inactive
+def select_cube(index):
+    _select(cube_active, index)
+    set_active_cache(index)
+
+@ti.kernel
+def _find_active(active: ti.template()) -> ti.i32:
+    first = active.shape[0]
+    for i in range(cube_count[None]):
+        if active[i] == 1:
+            ti.atomic_min(first, i)
+    result = -1
+    if first < active.shape[0]:
+        result = first
+    return result
+
+# Index of the first active cube (-1 if none), scanning the field
+def find_active_cube():
+    return _find_active(cube_active)
+
+# Set the cached active cube; the selection collapses to that cube
+def set_active_cache(index):
+    global active_index, selection
+    active_index = index
+    selection = {index} if index != -1 else set()
+
+# Rebuild the cache from the fields (after writing cube_active directly)
+def resync_active_cache():
+    set_active_cache(find_active_cube())
+
+# Add a cube to the multi-selection or remove it (the active cube always stays selected)
+def toggle_cube_selection(index):
+    if index < 0 or index >= cube_count[None] or index == active_index:
+        return False
+    if index in selection:
+        selection.discard(index)
+    else:
+        selection.add(index)
+    return True
+
+# Selected cube indices as an array (for batched movement)
+def get_selected_cubes():
+    return np.array(sorted(selection), dtype=np.int32)
+
+# Индекс куба после удаления куба index (None - это удаленный куб)
+def _index_after_delete(i, index, count, keep_order):
+    if i == index:
+        return None
+    if keep_order:
+        return i - 1 if i > index else i
+    return index if i == count - 1 else i
+
+@ti.kernel
+def _append(positions: ti.template(), colors: ti.template(), sizes: ti.template(),
+            active: ti.template(), last: ti.template(), steps: ti.template(),
+            x: ti.f32, y: ti.f32, r: ti.f32, g: ti.f32, b: ti.f32, size: ti.f32):
+    count = cube_count[None]
+    for i in range(count):
+        active[i] = 0
+    positions[count] = ti.Vector([x, y])
+    colors[count] = ti.Vector([r, g, b])
+    sizes[count] = size
+    active[count] = 1
+    last[count] = ti.Vector([x, y])
+    steps[count] = 0
+    cube_count[None] = count + 1
+
+# Append a new active cube (all others are deactivated)
+def append_cube(x, y, r, g, b, size):
+    _append(*cube_fields(), x, y, r, g, b, size)
+
+@ti.kernel
+def _compact_delete(positions: ti.template(), colors: ti.template(), sizes: ti.template(),
+                    active: ti.template(), last: ti.template(), steps: ti.template(),
+                    index: ti.i32):
+    count = cube_count[None]
+    ti.loop_config(serialize=True)
+    for i in range(index, count - 1):
+        positions[i] = positions[i + 1]
+        colors[i] = colors[i + 1]
+        sizes[i] = sizes[i + 1]
+        active[i] = active[i + 1]
+        last[i] = last[i + 1]
+        steps[i] = steps[i + 1]
+    cube_count[None] = count - 1
+
+# Compacting delete: shift cubes after index one slot down, keeping order
+def compact_delete(index):
+    _compact_delete(*cube_fields(), index)
+
+@ti.kernel
+def _swap_delete(positions: ti.template(), colors: ti.template(), sizes: ti.template(),
+                 active: ti.template(), last: ti.template(), steps: ti.template(),
+                 index: ti.i32):
+    last_index = cube_count[None] - 1
+    if index != last_index:
+        positions[index] = positions[last_index]
+        colors[index] = colors[last_index]
+        sizes[index] = sizes[last_index]
+        active[index] = active[last_index]
+        last[index] = last[last_index]
+        steps[index] = steps[last_index]
+    cube_count[None] = last_index
+
+# Swap-remove: move the last cube into the freed slot (O(1), order not preserved)
+def swap_delete(index):
+    _swap_delete(*cube_fields(), index)
+
+@ti.kernel
+def _set_position(positions: ti.template(), last: ti.template(), steps: ti.template(),
+                  index: ti.i32, x: ti.f32, y: ti.f32, count_step: ti.i32):
+    last[index] = positions[index]
+    positions[index] = ti.Vector([x, y])
+    if count_step:
+        steps[index] += 1
+
+# Move cube to a new position, remembering the previous one
+def set_cube_position(index, x, y, count_step):
+    _set_position(cube_positions, last_positions, cube_steps, index, x, y, count_step)
+
+@ti.kernel
+def _place(positions: ti.template(), last: ti.template(), steps: ti.template(),
+           index: ti.i32, x: ti.f32, y: ti.f32):
+    positions[index] = ti.Vector([x, y])
+    last[index] = ti.Vector([x, y])
+    steps[index] = 0
+
+# Put cube at a spawn point and reset its step counter
+def place_cube(index, x, y):
+    _place(cube_positions, last_positions, cube_steps, index, x, y)
+
+@ti.kernel
+def _gather(positions: ti.template(), sizes: ti.template(),
+            indices: ti.types.ndarray(), out: ti.types.ndarray()):
+    for k in range(indices.shape[0]):
+        i = indices[k]
+        out[k, 0] = positions[i][0]
+        out[k, 1] = positions[i][1]
+        out[k, 2] = sizes[i]
+
+# Positions and sizes of several cubes in one call: array (N, 3) of x, y, size
+def gather_cube_states(indices):
+    out = np.zeros((len(indices), 3), dtype=np.float32)
+    if len(indices) > 0:
+        _gather(cube_positions, cube_sizes, indices, out)
+    return out
+
+@ti.kernel
+def _move_cubes(positions: ti.template(), last: ti.template(), steps: ti.template(),
+                indices: ti.types.ndarray(), new_positions: ti.types.ndarray()):
+    for k in range(indices.shape[0]):
+        i = indices[k]
+        last[i] = positions[i]
+        positions[i] = ti.Vector([new_positions[k, 0], new_positions[k, 1]])
+        steps[i] += 1
+
+# Move several cubes at once, remembering previous positions and counting steps
+def move_cubes(indices, new_positions):
+    if len(indices) > 0:
+        _move_cubes(cube_positions, last_positions, cube_steps,
+                    np.ascontiguousarray(indices, dtype=np.int32),
+                    np.ascontiguousarray(new_positions, dtype=np.float32))
+
+# Function for determining the active cube (cached)
+def get_active_cube_index():
+    return active_index
 
 # Adding a new cube with specified parameters
 def add_new_cube(color=None, size=None, spawn_point_idx=None):
     count = cube_count[None]
-    if count < max_cubes:
-        # Deactivate all cubes
-        for i in range(count):
-            cube_active[i] = 0
-        
-        # Define new cube parameters
-        if color is None:
-            # Create random color if not specified
-            r = np.random.random()
-            g = np.random.random()
-            b = np.random.random()
-            color = [r, g, b]
-        
-        # Use default size if not specified
-        if size is None:
-            size = config.default_cube_size
-        
-        # Determine spawn point
-        if spawn_point_idx is None:
-            spawn_point_idx = config.current_spawn_point
-        
-        spawn_idx = spawn_point_idx % len(config.spawn_points)
-        spawn_x = config.spawn_points[spawn_idx][0]
-        spawn_y = config.spawn_points[spawn_idx][1]
-        
-        # Add new cube
-        cube_positions[count] = ti.Vector([spawn_x, spawn_y])
-        cube_colors[count] = ti.Vector([color[0], color[1], color[2]])
-        cube_sizes[count] = size
-        cube_active[count] = 1  # New cube is active
-        last_positions[count] = cube_positions[count]
-        cube_steps[count] = 0
-        
-        # Increment counter
-        cube_count[None] += 1
+    if count >= max_cubes:
+        # Нет места - удваиваем емкость (перевыделение амортизировано)
+        grow()
+    
+    # Define new cube parameters
+    if color is None:
+        # Create random color if not specified
+        r = np.random.random()
+        g = np.random.random()
+        b = np.random.random()
+        color = [r, g, b]
+    
+    # Use default size if not specified
+    if size is None:
+        size = config.default_cube_size
+    
+    # Determine spawn point
+    if spawn_point_idx is None:
+        spawn_point_idx = config.current_spawn_point
+    
+    spawn_idx = spawn_point_idx % len(config.spawn_points)
+    spawn_x = config.spawn_points[spawn_idx][0]
+    spawn_y = config.spawn_points[spawn_idx][1]
+    
+    # Add new cube (deactivates the others, new cube is active)
+    append_cube(spawn_x, spawn_y, color[0], color[1], color[2], size)
+    set_active_cache(count)
+    
+    # Play cube creation sound
+    sound.post_event('create_cube')
         
-        # Play cube creation sound
-        if config.sound_enabled:
-            sound.play_create_cube()
-            
-        return True
-    return False
+    return True
 
-# Delete cube by index
-def delete_cube(index):
+# Delete cube by index (keep_order=False uses O(1) swap-remove)
+def delete_cube(index, keep_order=True):
     count = cube_count[None]
+    global active_index, selection
     if index >= 0 and index < count:
-        # If not deleting the last cube, shift all cubes after it
-        if index < count - 1:
-            for i in range(index, count - 1):
-                cube_positions[i] = cube_positions[i + 1]
-                cube_colors[i] = cube_colors[i + 1]
-                cube_sizes[i] = cube_sizes[i + 1]
-                cube_active[i] = cube_active[i + 1]
-                last_positions[i] = last_positions[i + 1]
-                cube_steps[i] = cube_steps[i + 1]
+        if keep_order:
+            compact_delete(index)
+        else:
+            swap_delete(index)
         
-        # Decrease cube counter
-        cube_count[None] -= 1
+        # Пересчитываем индексы в кэше выбора
+        active_index = _index_after_delete(active_index, index, count, keep_order)
+        selection = {
+            _index_after_delete(i, index, count, keep_order) for i in selection
+        }
+        selection.discard(None)
         
         # If all cubes deleted, create a default one
-        if cube_count[None] == 0:
+        if count == 1:
             init_first_cube()
         # Otherwise, if active cube deleted, activate the last one
-        elif index == get_active_cube_index():
-            cube_active[cube_count[None] - 1] = 1
+        elif active_index is None:
+            active_index = count - 2
+            cube_active[active_index] = 1
+            selection.add(active_index)
             
         return True
     return False
@@ -162,101 +395,140 @@ def reset_active_cube_position():
         spawn_x = config.spawn_points[spawn_idx][0]
         spawn_y = config.spawn_points[spawn_idx][1]
         
-        cube_positions[active_index] = ti.Vector([spawn_x, spawn_y])
-        last_positions[active_index] = cube_positions[active_index]
-        cube_steps[active_index] = 0
+        place_cube(active_index, spawn_x, spawn_y)
         return True
     return False
 
-# Update active cube position based on WASD keys
+# Update selected cubes position based on WASD keys
+# Все выбранные кубы сдвигаются одним шагом: чтение и запись - пакетами, столкновения - swept-проверкой
+# Вызывается раз в кадр, поэтому здесь же воспроизводятся звуковые события кадра
 def update_active_cube_position(window):
-    # Find active cube
-    active_index = get_active_cube_index()
-    if active_index == -1:
+    indices = get_selected_cubes()
+    if len(indices) == 0:
+        sound.dispatch_events()
         return
     
-    # Save previous position
-    last_pos = np.array([cube_positions[active_index][0], cube_positions[active_index][1]])
-    last_positions[active_index] = ti.Vector([last_pos[0], last_pos[1]])
-    
-    # Current cube position
-    pos = np.array([cube_positions[active_index][0], cube_positions[active_index][1]])
-    new_pos = pos.copy()
-    size = cube_sizes[active_index]
-    
-    # Flag for tracking movement
-    moved = False
+    # Movement delta
+    delta = np.zeros(2, dtype=np.float32)
     
     # Process WASD keys
     if window.is_pressed('w'):
-        new_pos[1] += config.move_speed
-        moved = True
+        delta[1] += config.move_speed
     if window.is_pressed('s'):
-        new_pos[1] -= config.move_speed
-        moved = True
+        delta[1] -= config.move_speed
     if window.is_pressed('a'):
-        new_pos[0] -= config.move_speed
-        moved = True
+        delta[0] -= config.move_speed
     if window.is_pressed('d'):
-        new_pos[0] += config.move_speed
-        moved = True
+        delta[0] += config.move_speed
     
-    # Check collisions only if cube is moving
-    if moved:
-        # Check collisions
-        from collision import check_collision
-        had_collision = check_collision(new_pos, size)
+    # Check collisions only if cubes are moving
+    if delta.any():
+        from collision import move_and_slide_batch
         
-        if not had_collision:
-            # If no collision, update position
-            cube_positions[active_index] = ti.Vector([new_pos[0], new_pos[1]])
-            
-            # Increment step counter
-            cube_steps[active_index] += 1
+        # Swept-движение всех выбранных кубов одним пакетом: куб доходит до стены и скользит вдоль нее
+        states = gather_cube_states(indices)
+        new_positions, blocked = move_and_slide_batch(states[:, :2], states[:, 2], delta)
+        moved = (new_positions != states[:, :2]).any(axis=1)
+        
+        if moved.any():
+            # Move cubes that advanced, increment step counters
+            move_cubes(indices[moved], new_positions[moved])
             game_state.increment_step()
             
             # Calculate speed (approximate)
-            dx = new_pos[0] - last_pos[0]
-            dy = new_pos[1] - last_pos[1]
-            speed = np.sqrt(dx*dx + dy*dy) * 100  # Scale for display convenience
+            speed = np.sqrt(delta[0]*delta[0] + delta[1]*delta[1]) * 100  # Scale for display convenience
             game_state.update_cube_speed(speed)
-        elif config.sound_enabled:
+        if blocked.any():
             # If collision detected, play sound
-            sound.play_collision()
+            sound.post_event('collision')
     else:
         # If cube not moving, speed is 0
         game_state.update_cube_speed(0.0)
+    
+    # Play sounds posted this frame (movement, cube creation from the UI)
+    sound.dispatch_events()
+
+# Пространственный индекс целевых зон (перестраивается, когда меняется config.target_zones)
+_zone_index = None
+_zone_index_key = None
+
+# Grid index over config.target_zones, rebuilt only when the zones change
+def get_target_zone_index():
+    global _zone_index, _zone_index_key
+    zones = np.asarray(config.target_zones, dtype=np.float32).reshape(-1, 3)
+    key = zones.tobytes()
+    if _zone_index is None or key != _zone_index_key:
+        _zone_index = ZoneIndex(zones)
+        _zone_index_key = key
+    return _zone_index
+
+# Batched target query for all cubes (or given positions (N, 2))
+# Returns per-cube zone ids (-1 outside all zones) and per-zone occupancy counts
+def query_target_zones(positions=None):
+    if positions is None:
+        positions = cube_positions.to_numpy()[:cube_count[None]]
+    
+    zone_count = len(config.target_zones)
+    if zone_count >= config.target_zone_index_min_zones:
+        zone_ids = get_target_zone_index().query(positions)
+    else:
+        zone_ids = query_zones(positions, config.target_zones)
+    return zone_ids, zone_occupancy(zone_ids, zone_count)
 
 # Check if cube is in target zone
 def is_cube_in_target_zone(cube_index):
     if cube_index < 0 or cube_index >= cube_count[None]:
         return False
-        
-    # Cube position
-    pos = np.array([cube_positions[cube_index][0], cube_positions[cube_index][1]])
     
-    # Check each target zone
-    for zone in config.target_zones:
-        zone_x, zone_y, zone_radius = zone
-        
-        # Distance from cube to zone center
-        dist = np.sqrt((pos[0] - zone_x)**2 + (pos[1] - zone_y)**2)
-        
-        # If cube center is inside zone, return True
-        if dist <= zone_radius:
-            return True
-            
-    return False 
+    states = gather_cube_states(np.array([cube_index], dtype=np.int32))
+    zone_ids, _ = query_target_zones(states[:, :2])
+    return bool(zone_ids[0] >= 0)
 
 class CubeManager:
-    def __init__(self, renderer):
+    def __init__(self, renderer, capacity=64):
+        from rendering import INSTANCE_FLOATS
+        
         self.renderer = renderer
-        self.cubes = []
         self.selected_cube_index = None
+        self.instance_floats = INSTANCE_FLOATS
+        
+        # Кубы хранятся в непрерывных массивах; первые count строк заняты
+        self.count = 0
+        self.capacity = 0
+        self.instances = None
+        self.velocities = None
+        self.reserve(capacity)
+        
+        # Batched RNG for rotation jitter
+        self.rng = np.random.default_rng()
         
         # Load the cube model at initialization
         self.cube_model = self.renderer.load_model_obj("cube.obj")
+    
+    # Grow the arrays (2x) to hold at least `capacity` cubes
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, self.capacity * 2)
         
+        # instances - в формате буфера экземпляров рендерера: offset (3), scale (3), color (4),
+        # rotation (3), поэтому массив загружается в GPU как есть, без копирования по кубам
+        instances = np.zeros((capacity, self.instance_floats), dtype=np.float32)
+        velocities = np.zeros((capacity, 3), dtype=np.float32)
+        if self.instances is not None:
+            instances[:self.count] = self.instances[:self.count]
+            velocities[:self.count] = self.velocities[:self.count]
+        
+        self.instances = instances
+        self.velocities = velocities
+        
+        # Views into the instance array
+        self.positions = instances[:, 0:3]
+        self.scales = instances[:, 3:6]
+        self.colors = instances[:, 6:10]
+        self.rotations = instances[:, 10:13]
+        self.capacity = capacity
+    
     def create_cube(self, position=None):
         # Create cube with random position if not specified
         if position is None:
@@ -280,79 +552,111 @@ class CubeManager:
             random.uniform(0, 360)
         ]
         
-        # Set initial cube properties
-        self.cubes.append({
-            'position': position,
-            'rotation': rotation,
-            'scale': [1.0, 1.0, 1.0],
-            'color': color,
-            'velocity': [0, 0, 0]
-        })
+        index = self.add_instance(position, rotation, [1.0, 1.0, 1.0], color)
         
         # Play sound when cube is created
-        sound.play_create_cube()
+        sound.post_event('create_cube')
         
-        return len(self.cubes) - 1  # Return index of created cube
+        return index  # Return index of created cube
+    
+    # Add a render instance with an explicit transform (no sound, no random values)
+    def add_instance(self, position, rotation, scale, color):
+        if self.count >= self.capacity:
+            self.reserve(self.count + 1)
+        index = self.count
+        self.count += 1
+        
+        self.positions[index] = position
+        self.rotations[index] = rotation
+        self.scales[index] = scale
+        self.colors[index, :3] = color[:3]
+        self.colors[index, 3] = color[3] if len(color) > 3 else 1.0
+        self.velocities[index] = 0.0
+        return index
+    
+    # Update the transform of an existing instance
+    def set_transform(self, index, position, rotation, scale):
+        self.positions[index] = position
+        self.rotations[index] = rotation
+        self.scales[index] = scale
+    
+    # Удаление перестановкой с последним кубом за O(1)
+    # Возвращает прежний индекс перемещенного куба (или None, если ничего не перемещалось)
+    def remove_cube(self, index):
+        last = self.count - 1
+        moved = None
+        if index != last:
+            self.instances[index] = self.instances[last]
+            self.velocities[index] = self.velocities[last]
+            moved = last
+        self.count -= 1
+        
+        if self.selected_cube_index == index:
+            self.selected_cube_index = None
+        elif moved is not None and self.selected_cube_index == moved:
+            self.selected_cube_index = index
+        return moved
+    
+    # Remove all cubes
+    def clear(self):
+        self.count = 0
+        self.selected_cube_index = None
     
     def update(self, delta_time):
-        # Update all cubes (position, rotation, etc.)
-        for i, cube in enumerate(self.cubes):
+        n = self.count
+        if n > 0:
+            # Update all cubes at once (position, rotation, etc.)
+            positions = self.positions[:n]
+            velocities = self.velocities[:n]
+            
             # Apply gravity
-            cube['velocity'][1] -= GRAVITY * delta_time
+            velocities[:, 1] -= GRAVITY * delta_time
             
             # Update position based on velocity
-            for j in range(3):
-                cube['position'][j] += cube['velocity'][j] * delta_time
+            positions += velocities * delta_time
             
             # Boundary checking for floor
-            if cube['position'][1] < -5:
-                cube['position'][1] = -5
-                cube['velocity'][1] = -cube['velocity'][1] * BOUNCE_FACTOR
-                sound.play_collision()
+            below = positions[:, 1] < -5
+            if below.any():
+                sound.post_event('collision', float(np.abs(velocities[below, 1]).max()))
+                positions[below, 1] = -5
+                velocities[below, 1] *= -BOUNCE_FACTOR
             
-            # Random rotation
+            # Random rotation (one RNG draw for all cubes)
             if RANDOM_ROTATION:
-                for j in range(3):
-                    cube['rotation'][j] += random.uniform(-1, 1) * ROTATION_SPEED * delta_time
+                self.rotations[:n] += self.rng.uniform(-1, 1, (n, 3)) * (ROTATION_SPEED * delta_time)
+        
+        # Воспроизводим звуки кадра из одного места
+        sound.dispatch_events()
     
     def render(self):
-        # Draw all cubes
-        for i, cube in enumerate(self.cubes):
-            # Highlight selected cube
-            highlight = (i == self.selected_cube_index)
-            
-            # Check if we're in 2D mode
-            is_2d_mode = hasattr(self.renderer, 'is_2d') and self.renderer.is_2d
-            
-            if is_2d_mode:
-                # В 2D режиме используем только x и y позиции
-                pos = [cube['position'][0], cube['position'][1], 0.0]
-                scale = [cube['scale'][0], cube['scale'][1], 1.0]  # В 2D z-scale не важен
-            else:
-                # В 3D используем все параметры
-                pos = cube['position']
-                scale = cube['scale']
-            
-            # Если куб выделен, делаем его немного ярче
-            color = cube['color'].copy()
-            if highlight:
-                for j in range(3):
-                    color[j] = min(1.0, color[j] * 1.5)
-            
-            # Добавляем альфа-компонент, если его нет
-            if len(color) == 3:
-                color.append(1.0)
-                
-            # Используем draw_cube вместо draw_model
-            self.renderer.draw_cube(
-                pos,
-                scale,
-                color
-            )
+        n = self.count
+        if n == 0:
+            return
+        
+        # Массив экземпляров уже в формате буфера - копируется в очередь отрисовки Renderer
+        data = self.instances[:n]
+        selected = self.selected_cube_index
+        is_2d_mode = hasattr(self.renderer, 'is_2d') and self.renderer.is_2d
+        if selected is not None or is_2d_mode:
+            data = data.copy()
+        
+        if is_2d_mode:
+            # В 2D режиме используем только x и y позиции, z-scale не важен,
+            # вращение - только в плоскости экрана
+            data[:, 2] = 0.0
+            data[:, 5] = 1.0
+            data[:, 10:12] = 0.0
+        
+        # Если куб выделен, делаем его немного ярче
+        if selected is not None:
+            data[selected, 6:9] = np.minimum(1.0, data[selected, 6:9] * 1.5)
+        
+        self.renderer.draw_instance_data(data)
     
     def select_cube(self, index):
         # Select a cube by index
-        if 0 <= index < len(self.cubes):
+        if 0 <= index < self.count:
             self.selected_cube_index = index
             return True
         return False
@@ -360,5 +664,4 @@ class CubeManager:
     def apply_force_to_selected(self, force):
         # Apply force to the selected cube
         if self.selected_cube_index is not None:
-            for i in range(3):
-                self.cubes[self.selected_cube_index]['velocity'][i] += force[i]
\ No newline at end of file
+            self.velocities[self.selected_cube_index] += force[:3]
@@ -0,0 +1,187 @@
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import taichi as ti
+import config
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CAPTURE_FORMATS = ('png', 'raw', 'gif')
+
+# Копируем RGBA-поле Taichi (x, y), y вверх, в кадр (H, W, 3) uint8, верхняя строка первой
+@ti.kernel
+def _copy_pixels(pixels: ti.template(), out: ti.types.ndarray()):
+    height = out.shape[0]
+    for i, j in pixels:
+        color = ti.math.clamp(pixels[i, j], 0.0, 1.0) * 255.0 + 0.5
+        for c in ti.static(range(3)):
+            out[height - 1 - j, i, c] = ti.cast(color[c], ti.u8)
+
+# Минимальная запись PNG (RGB, 8 бит) без сторонних зависимостей
+def encode_png(frame, level=1):
+    height, width, _ = frame.shape
+    # Каждая строка начинается с байта фильтра (0 - без фильтра)
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = frame.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(rows.tobytes(), level)) + chunk(b'IEND', b''))
+
+# Новая папка записи внутри base: метка времени, при совпадении - с суффиксом
+def session_directory(base):
+    name = time.strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(base, name)
+    suffix = 1
+    while os.path.exists(path):
+        suffix += 1
+        path = os.path.join(base, f"{name}_{suffix}")
+    os.makedirs(path)
+    return path
+
+# Асинхронная запись кадров
+# Кадр копируется в свободный буфер из заранее выделенного пула (в игровом потоке),
+# кодирование и запись идут в пуле рабочих потоков. Если свободных буферов нет,
+# кадр пропускается, а не тормозит игру. Каждая запись идет в свою папку внутри directory,
+# поэтому повторная запись не перезаписывает предыдущую.
+class FrameCapture:
+    def __init__(self, size, directory=None, fmt=None, pool_size=None, workers=None, fps=None):
+        self.width, self.height = size
+        base_directory = directory if directory is not None else config.capture_directory
+        self.format = fmt if fmt is not None else config.capture_format
+        self.fps = fps if fps is not None else config.capture_fps
+        pool_size = max(1, pool_size if pool_size is not None else config.capture_pool_size)
+        workers = max(1, workers if workers is not None else config.capture_workers)
+
+        if self.format not in CAPTURE_FORMATS:
+            raise ValueError(f"Unknown capture format: {self.format} (available: {', '.join(CAPTURE_FORMATS)})")
+        if self.format == 'gif' and Image is None:
+            raise ValueError("GIF capture requires Pillow")
+
+        os.makedirs(base_directory, exist_ok=True)
+        self.directory = session_directory(base_directory)
+        self.frame_bytes = self.width * self.height * 3
+
+        # Пул буферов: глубина очереди ограничена числом буферов
+        self.free_buffers = queue.Queue()
+        for _ in range(pool_size):
+            self.free_buffers.put(np.empty((self.height, self.width, 3), dtype=np.uint8))
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="capture")
+        self.lock = threading.Lock()
+        self.pending = []
+        self.sequence = 0
+        self.stats = {'captured': 0, 'dropped': 0, 'written': 0}
+        self.last_error = None
+        self.gif_frames = {}
+
+        self.raw_file = None
+        if self.format == 'raw':
+            # Сырые кадры RGB24 подряд; размер и fps - в имени файла (для ffmpeg -f rawvideo)
+            name = f"capture_{self.width}x{self.height}_{self.fps}fps.rgb"
+            self.raw_file = open(os.path.join(self.directory, name), 'wb')
+
+    # Свободный буфер или None (кадр пропускается)
+    def _acquire(self):
+        # GIF собирается в памяти целиком, поэтому его длина ограничена
+        if self.format == 'gif' and self.sequence >= config.capture_gif_max_frames:
+            self.stats['dropped'] += 1
+            return None
+        try:
+            return self.free_buffers.get_nowait()
+        except queue.Empty:
+            self.stats['dropped'] += 1
+            return None
+
+    # Capture a Taichi RGBA pixel field (x, y), as used by main.py
+    def capture_pixels(self, pixels):
+        buffer = self._acquire()
+        if buffer is None:
+            return False
+        _copy_pixels(pixels, buffer)
+        self._submit(buffer, flip=False)
+        return True
+
+    # Capture a moderngl framebuffer (rows come bottom-up, flipped by the worker)
+    def capture_framebuffer(self, fbo):
+        buffer = self._acquire()
+        if buffer is None:
+            return False
+        fbo.read_into(buffer, viewport=(0, 0, self.width, self.height), components=3)
+        self._submit(buffer, flip=True)
+        return True
+
+    def _submit(self, buffer, flip):
+        index = self.sequence
+        self.sequence += 1
+        self.stats['captured'] += 1
+        future = self.executor.submit(self._encode, index, buffer, flip)
+        with self.lock:
+            self.pending = [f for f in self.pending if not f.done()]
+            self.pending.append(future)
+
+    def _encode(self, index, buffer, flip):
+        try:
+            frame = buffer[::-1] if flip else buffer
+            if self.format == 'png':
+                data = encode_png(frame, config.capture_png_level)
+                with open(os.path.join(self.directory, f"frame_{index:06d}.png"), 'wb') as f:
+                    f.write(data)
+            elif self.format == 'raw':
+                data = np.ascontiguousarray(frame).tobytes()
+                with self.lock:
+                    self.raw_file.seek(index * self.frame_bytes)
+                    self.raw_file.write(data)
+            else:
+                # Квантование в палитру - в рабочем потоке, сборка GIF - в stop()
+                image = Image.fromarray(frame).quantize(colors=256)
+                with self.lock:
+                    self.gif_frames[index] = image
+            with self.lock:
+                self.stats['written'] += 1
+        except Exception as e:
+            # Любая ошибка кодирования не должна всплывать из flush()/stop() в игровой цикл:
+            # кадр считается пропущенным, ошибка сохраняется в last_error
+            with self.lock:
+                self.stats['dropped'] += 1
+            self.last_error = e
+            print(f"Ошибка записи кадра: {e}")
+        finally:
+            self.free_buffers.put(buffer)
+
+    # Дождаться записи всех поставленных кадров
+    def flush(self):
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            future.result()
+
+    # Stop recording: finish queued frames and close the output
+    def stop(self):
+        self.flush()
+        self.executor.shutdown(wait=True)
+        if self.raw_file is not None:
+            self.raw_file.close()
+            self.raw_file = None
+        if self.format == 'gif' and self.gif_frames:
+            frames = [self.gif_frames[i] for i in sorted(self.gif_frames)]
+            try:
+                frames[0].save(os.path.join(self.directory, "capture.gif"), save_all=True,
+                               append_images=frames[1:], duration=int(1000 / self.fps), loop=0)
+            except Exception as e:
+                self.last_error = e
+                print(f"Ошибка записи GIF: {e}")
+            self.gif_frames.clear()
+        return dict(self.stats)
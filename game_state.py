@@ -1,10 +1,71 @@
 import taichi as ti
 import config
 import sound
+import save_format
 import numpy as np
+import os
 import time
 import random
 
+# Начальный набор объектов уровня (общий для всех бэкендов физики)
+def add_initial_objects(state):
+    # Add a platform as floor
+    state.add_platform([0, -5], 20.0)
+    
+    # Add walls
+    state.add_platform([-10, 0], 1.0, [0.3, 0.5, 0.8])  # Левая стенка
+    state.add_platform([10, 0], 1.0, [0.3, 0.5, 0.8])   # Правая стенка
+    
+    # Add several dynamic cubes at different locations
+    state.create_cube([0, 3])      # Куб прямо по центру
+    state.create_cube([5, 5])      # Куб справа
+    state.create_cube([-5, 7])     # Куб слева
+    state.create_cube([2, 10])     # Куб высоко справа
+    state.create_cube([-2, 10])    # Куб высоко слева
+    state.create_cube([0, 0], [0, 0], 0.5)  # Маленький куб на платформе
+    
+    # Добавляем монетки
+    state.create_collectible([3, 1])
+    state.create_collectible([-3, 1])
+    
+    # Добавляем движущуюся платформу
+    state.create_moving_platform([0, 2], [3, 0], 3.0)
+
+# Создать игровое состояние с выбранным бэкендом физики ("python" или "taichi")
+# autosave=None - по config.autosave_enabled (по умолчанию включено, файлы пишутся
+# в config.autosave_directory относительно рабочей директории)
+# Бэкенды отличаются тем, что возвращают create_cube/add_platform/create_collectible/
+# create_moving_platform: "python" - словарь объекта (с ключом 'id'), "taichi" - индекс
+# объекта в полях (совпадает с 'id' в словарях state.cubes) или -1 при нехватке емкости
+def create_game_state(backend=None, autosave=None):
+    if backend is None:
+        backend = config.physics_backend
+    if autosave is None:
+        autosave = config.autosave_enabled
+    if backend == 'python':
+        state = GameState()
+    elif backend == 'taichi':
+        from taichi_game_state import TaichiGameState
+        state = TaichiGameState()
+    else:
+        raise ValueError(f"Unknown physics backend: {backend}")
+
+    if autosave:
+        state.enable_autosave()
+    return state
+
+# Колонки сохранения из снимка GameState.snapshot (вызывается в рабочем потоке автосохранения)
+def snapshot_columns(objects, changing):
+    columns = save_format.objects_to_columns(objects)
+    if changing:
+        positions, velocities, rotations, active, move_dirs = zip(*changing)
+        columns['position'] = np.array(positions, dtype='<f4')
+        columns['velocity'] = np.array(velocities, dtype='<f4')
+        columns['rotation'] = np.array(rotations, dtype='<f4')
+        columns['active'] = np.array(active, dtype='<u1')
+        columns['move_dir'] = np.array(move_dirs, dtype='<i1')
+    return columns
+
 # Game state variables
 class GameState:
     def __init__(self):
@@ -17,45 +78,61 @@ class GameState:
         # Initialize cubes list
         self.cubes = []
         
+        # Стабильные id объектов и журнал изменений для рендера
+        self.next_object_id = 0
+        self.render_reset = True  # Все объекты нужно пересоздать
+        self.spawned = []  # Новые объекты
+        self.despawned = set()  # id исчезнувших объектов
+        self.dirty = {}  # id -> объект с измененной трансформацией
+        self.render_bridge = None
+        
         # Физические константы
         self.gravity = 9.8
         self.friction = 0.98  # Коэффициент трения (для инерции)
         self.bounce_factor = 0.7  # Коэффициент отскока при столкновениях
         
+        # Фоновое автосохранение (включается через enable_autosave, см. create_game_state)
+        self.autosaver = None
+        
         # Create initial cubes
         self.add_initial_cubes()
         
     # Add initial cubes for testing
     def add_initial_cubes(self):
-        # Add a platform as floor
-        self.add_platform([0, -5], 20.0)
-        
-        # Add walls
-        self.add_platform([-10, 0], 1.0, [0.3, 0.5, 0.8])  # Левая стенка
-        self.add_platform([10, 0], 1.0, [0.3, 0.5, 0.8])   # Правая стенка
-        
-        # Add several dynamic cubes at different locations
-        self.create_cube([0, 3])      # Куб прямо по центру
-        self.create_cube([5, 5])      # Куб справа
-        self.create_cube([-5, 7])     # Куб слева
-        self.create_cube([2, 10])     # Куб высоко справа
-        self.create_cube([-2, 10])    # Куб высоко слева
-        self.create_cube([0, 0], [0, 0], 0.5)  # Маленький куб на платформе
-        
-        # Добавляем монетки
-        self.create_collectible([3, 1])
-        self.create_collectible([-3, 1])
-        
-        # Добавляем движущуюся платформу
-        self.create_moving_platform([0, 2], [3, 0], 3.0)
+        add_initial_objects(self)
         
     # Reset game state
     def reset(self):
         self.score = 0
         self.game_over = False
         self.cubes.clear()
+        self.mark_render_reset()
         self.add_initial_cubes()
         
+    # Присвоить объекту стабильный id и записать его появление
+    def register_object(self, obj):
+        obj['id'] = self.next_object_id
+        self.next_object_id += 1
+        self.cubes.append(obj)
+        self.spawned.append(obj)
+        return obj
+    
+    # Весь список объектов заменен (сброс, загрузка) - рендер пересоздает все экземпляры
+    def mark_render_reset(self):
+        self.render_reset = True
+        self.spawned.clear()
+        self.despawned.clear()
+        self.dirty.clear()
+    
+    # Забрать накопленные изменения: (reset, spawned, despawned, dirty)
+    def pop_render_changes(self):
+        changes = (self.render_reset, self.spawned, self.despawned, self.dirty)
+        self.render_reset = False
+        self.spawned = []
+        self.despawned = set()
+        self.dirty = {}
+        return changes
+    
     # Update score
     def update_score(self, points=1):
         self.score += points
@@ -86,8 +163,8 @@ class GameState:
             'rotation_speed': random.uniform(-1.0, 1.0) * 50.0,  # Случайная скорость вращения
             'acceleration': [0, 0]  # Для инерции
         }
-        self.cubes.append(cube)
-        sound.play_create_cube()
+        self.register_object(cube)
+        sound.post_event('create_cube')
         return cube
     
     # Add a static platform
@@ -109,7 +186,7 @@ class GameState:
             'rotation': 0,
             'rotation_speed': 90.0  # Монетки крутятся быстрее
         }
-        self.cubes.append(coin)
+        self.register_object(coin)
         return coin
     
     # Create moving platform
@@ -129,11 +206,37 @@ class GameState:
             'move_dir': 1,  # 1 вперед, -1 назад
             'move_timer': 0
         }
-        self.cubes.append(platform)
+        self.register_object(platform)
         return platform
     
+    # Включить периодическое автосохранение в фоновом потоке
+    def enable_autosave(self, directory=None, interval=None, retention=None):
+        from autosave import Autosaver
+        
+        if self.autosaver is not None:
+            self.autosaver.stop()
+        self.autosaver = Autosaver(directory, interval, retention)
+        print(f"Автосохранение каждые {self.autosaver.interval:g} с в {os.path.abspath(self.autosaver.directory)}")
+        return self.autosaver
+    
+    # Снимок для автосохранения: (score, make_columns)
+    # В игровом потоке запоминаем только значения, которые игра меняет (позиция, скорость,
+    # вращение, active, move_dir), без копирования словарей; остальные поля читаются из
+    # общих объектов, а сборка колонок идет в рабочем потоке при вызове make_columns()
+    def snapshot(self):
+        objects = list(self.cubes)
+        changing = [
+            (obj['position'][:], obj['velocity'][:], obj.get('rotation', 0.0), obj['active'], obj.get('move_dir', 1))
+            for obj in objects
+        ]
+        return self.score, lambda: snapshot_columns(objects, changing)
+    
     # Update the game state
     def update(self, dt):
+        # Автосохранение по таймеру (запись идет в фоне)
+        if self.autosaver is not None:
+            self.autosaver.update(dt, self)
+            
         # Skip if game over
         if self.game_over:
             return
@@ -159,6 +262,8 @@ class GameState:
                 if 'rotation' in cube and 'rotation_speed' in cube:
                     cube['rotation'] += cube['rotation_speed'] * dt
                 
+                self.dirty[cube['id']] = cube
+                
                 # Check floor collision
                 if cube['position'][1] - cube['size']/2 < -10:
                     cube['position'][1] = -10 + cube['size']/2
@@ -182,6 +287,9 @@ class GameState:
                 
         # Check game over conditions
         self.check_game_over()
+        
+        # Воспроизводим звуки кадра из одного места
+        sound.dispatch_events()
     
     # Обновление движущихся платформ
     def update_moving_platforms(self, dt):
@@ -208,6 +316,7 @@ class GameState:
                 
                 # Обновляем позицию платформы
                 platform['position'] = new_pos
+                self.dirty[platform['id']] = platform
                 
                 # Перемещаем все объекты, стоящие на платформе
                 for cube in self.cubes:
@@ -242,10 +351,11 @@ class GameState:
                 if distance < (cube['size'] + collectible['size'])/2:
                     # Собираем монетку
                     collectible['active'] = False
+                    self.despawned.add(collectible['id'])
                     # Увеличиваем счет
                     self.update_score(10)
                     # Воспроизводим звук сбора монетки
-                    sound.play_collectible()
+                    sound.post_event('collectible')
     
     # Check for collisions between cubes
     def check_cube_collisions(self, current_cube):
@@ -293,8 +403,8 @@ class GameState:
                         current_cube['velocity'][0] -= 2 * dot_product * nx * self.bounce_factor
                         current_cube['velocity'][1] -= 2 * dot_product * ny * self.bounce_factor
                         
-                    # Воспроизводим звук при столкновении
-                    sound.play_collision()
+                        # Звук столкновения с силой удара
+                        sound.post_event('collision', -dot_product)
                 else:
                     # Оба куба подвижны, реализуем физически корректное столкновение
                     
@@ -320,6 +430,7 @@ class GameState:
                     current_cube['position'][1] += ny * overlap * current_weight
                     other_cube['position'][0] -= nx * overlap * other_weight
                     other_cube['position'][1] -= ny * overlap * other_weight
+                    self.dirty[other_cube['id']] = other_cube
                     
                     # Рассчитываем относительную скорость вдоль нормали
                     vx_rel = current_cube['velocity'][0] - other_cube['velocity'][0]
@@ -357,8 +468,8 @@ class GameState:
                     other_cube['velocity'][0] += np.random.uniform(-0.01, 0.01)
                     other_cube['velocity'][1] += np.random.uniform(-0.01, 0.01)
                     
-                    # Воспроизводим звук при столкновении
-                    sound.play_collision()
+                    # Звук столкновения с силой удара
+                    sound.post_event('collision', -vel_along_normal)
     
     # Check game over conditions
     def check_game_over(self):
@@ -367,79 +478,61 @@ class GameState:
         if dynamic_cubes == 0:
             self.game_over = True
 
-    # Get a CubeManager instance for rendering
+    # Get the CubeManager used for rendering, synced incrementally with the game state
     def get_cube_manager(self, renderer):
-        from cube_manager import CubeManager
+        from render_bridge import RenderBridge
         
-        # Create a new CubeManager
-        cube_manager = CubeManager(renderer)
+        # Мост создается один раз на рендерер и дальше только применяет изменения
+        if self.render_bridge is None or self.render_bridge.renderer is not renderer:
+            self.render_bridge = RenderBridge(renderer)
+            self.mark_render_reset()
         
-        # Create cubes in the CubeManager
-        for cube in self.cubes:
-            if cube.get('active', False):
-                # Convert from 2D to 3D position if needed
-                pos = cube['position'].copy()
-                if len(pos) == 2:
-                    pos = [pos[0], pos[1], 0.0]
-                
-                # Set rotation based on type
-                if cube['type'] == 'cube' or cube['type'] == 'moving_platform':
-                    rotation = [
-                        random.uniform(0, 360),
-                        random.uniform(0, 360),
-                        random.uniform(0, 360)
-                    ]
-                else:  # Для монеток вращение только вокруг оси Y
-                    rotation = [0, cube['rotation'], 0]
-                
-                # Assign color based on type
-                if 'color' in cube:
-                    color = cube['color']
-                else:
-                    color = [0.8, 0.2, 0.2] if not cube.get('fixed', False) else [0.3, 0.3, 0.8]
-                
-                # Create cube in CubeManager
-                index = cube_manager.create_cube(pos)
-                
-                # Update properties
-                cube_manager.cubes[index]['rotation'] = rotation
-                cube_manager.cubes[index]['scale'] = [cube['size'], cube['size'], cube['size']]
-                cube_manager.cubes[index]['color'] = color
-                
-                # Для монеток другая форма (сплющенный куб)
-                if cube['type'] == 'collectible':
-                    cube_manager.cubes[index]['scale'] = [cube['size'], cube['size']*0.2, cube['size']]
-                
-        return cube_manager
+        self.render_bridge.sync(self)
+        return self.render_bridge.cube_manager
         
     # Сохранить состояние в файл
-    def save_state(self, filename='save.txt'):
-        save_data = {
-            'score': self.score,
-            'cubes': self.cubes
-        }
-        
-        with open(filename, 'w') as f:
+    def save_state(self, filename='save.txt', binary=None):
+        if binary is None:
+            binary = config.save_binary
+            
+        if binary:
+            # Бинарный формат: типизированные колонки, опционально сжатые
+            save_format.save_objects(filename, self.cubes, self.score, compress=config.save_compress)
+        else:
+            save_data = {
+                'score': self.score,
+                'cubes': self.cubes
+            }
+            
             # Преобразуем данные в строковый формат
             import json
             json_data = json.dumps(save_data)
-            f.write(json_data)
+            save_format.atomic_write(filename, json_data.encode('utf-8'))
             
         print(f"Состояние сохранено в {filename}")
         
-    # Загрузить состояние из файла
+    # Загрузить состояние из файла (формат определяется по заголовку)
     def load_state(self, filename='save.txt'):
         try:
-            with open(filename, 'r') as f:
-                import json
-                data = json.load(f)
+            if save_format.is_binary_save(filename):
+                score, cubes = save_format.load_objects(filename)
+            else:
+                with open(filename, 'r') as f:
+                    import json
+                    data = json.load(f)
+                score = data['score']
+                cubes = data['cubes']
                 
-                # Обновляем состояние
-                self.score = data['score']
-                self.cubes = data['cubes']
+            # Обновляем состояние
+            self.score = score
+            self.cubes = []
+            self.mark_render_reset()
+            for obj in cubes:
+                self.register_object(obj)
+            self.spawned.clear()
                 
             print(f"Состояние загружено из {filename}")
             return True
-        except:
-            print(f"Ошибка при загрузке состояния из {filename}")
-            return False 
\ No newline at end of file
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ошибка при загрузке состояния из {filename}: {e}")
+            return False 
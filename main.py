@@ -6,6 +6,8 @@ import math
 import json
 import os
 import sys
+from frame_capture import FrameCapture
+from quality_governor import QualityGovernor
 
 # Initialize Taichi with CPU arch for compatibility
 ti.init(arch=ti.cpu, default_fp=ti.f32, debug=False, kernel_profiler=False)
@@ -32,6 +34,11 @@ GRAVITY = 9.8  # Units per second squared
 FRICTION = 0.98  # Friction coefficient
 BOUNCE_FACTOR = 0.7  # Bounce coefficient
 
+# Internal render resolution: one of RENDER_SCALES or "auto" (chosen by the quality governor)
+RENDER_SCALES = (0.5, 0.75, 1.0)
+RENDER_SCALE = "auto"
+FRAME_BUDGET = 1.0 / FPS  # Target for simulate + render time per frame (vsync wait excluded)
+
 # Maximum number of objects and particles
 MAX_OBJECTS = 100
 MAX_PARTICLES = 500
@@ -76,6 +83,10 @@ next_particle_id = ti.field(dtype=ti.i32, shape=())
 active_objects = ti.field(dtype=ti.i32, shape=())
 active_particles = ti.field(dtype=ti.i32, shape=())
 
+# Quality settings applied by the governor
+particle_emission = ti.field(dtype=ti.f32, shape=())  # Multiplier for particles per contact
+particle_cap = ti.field(dtype=ti.i32, shape=())  # Usable part of the particle buffer
+
 # Initialize fields
 @ti.kernel
 def init_fields():
@@ -89,6 +100,8 @@ def init_fields():
     next_particle_id[None] = 0
     active_objects[None] = 0
     active_particles[None] = 0
+    particle_emission[None] = 1.0
+    particle_cap[None] = MAX_PARTICLES
     
     # Initialize object fields
     for i in range(MAX_OBJECTS):
@@ -133,8 +146,10 @@ def update_physics(dt: ti.f32):
                 pos_y[i] = SCREEN_HEIGHT - size[i]
                 vel_y[i] = -vel_y[i] * BOUNCE_FACTOR
 
+# emit_contacts - создавать ли частицы контактов (только на первом проходе за кадр,
+# чтобы дополнительные проходы не умножали число частиц)
 @ti.kernel
-def resolve_collisions():
+def resolve_collisions(emit_contacts: ti.i32):
     # Object-object collision detection and resolution
     for i in range(MAX_OBJECTS):
         if active[i] == 0 or is_static[i] == 1:
@@ -185,7 +200,8 @@ def resolve_collisions():
                     if dot_product < 0:  # Moving towards j
                         vel_x[i] -= 2 * dot_product * nx * BOUNCE_FACTOR
                         vel_y[i] -= 2 * dot_product * ny * BOUNCE_FACTOR
-                        create_particles_at(pos_x[i], pos_y[i], color_r[i], color_g[i], color_b[i], 5)
+                        if emit_contacts == 1:
+                            create_particles_at(pos_x[i], pos_y[i], color_r[i], color_g[i], color_b[i], 5)
                     
                 elif is_static[i] == 1:
                     # i is static, move only j
@@ -197,7 +213,8 @@ def resolve_collisions():
                     if dot_product > 0:  # Moving towards i
                         vel_x[j] -= 2 * dot_product * nx * BOUNCE_FACTOR
                         vel_y[j] -= 2 * dot_product * ny * BOUNCE_FACTOR
-                        create_particles_at(pos_x[j], pos_y[j], color_r[j], color_g[j], color_b[j], 5)
+                        if emit_contacts == 1:
+                            create_particles_at(pos_x[j], pos_y[j], color_r[j], color_g[j], color_b[j], 5)
                     
                 else:
                     # Both dynamic - distribute by mass
@@ -250,10 +267,11 @@ def resolve_collisions():
                         vel_y[j] += (ti.random() - 0.5) * rand_factor
                         
                         # Create particles
-                        create_particles_at((pos_x[i] + pos_x[j])/2, (pos_y[i] + pos_y[j])/2, 
-                                          (color_r[i] + color_r[j])/2, 
-                                          (color_g[i] + color_g[j])/2, 
-                                          (color_b[i] + color_b[j])/2, 5)
+                        if emit_contacts == 1:
+                            create_particles_at((pos_x[i] + pos_x[j])/2, (pos_y[i] + pos_y[j])/2, 
+                                              (color_r[i] + color_r[j])/2, 
+                                              (color_g[i] + color_g[j])/2, 
+                                              (color_b[i] + color_b[j])/2, 5)
 
 @ti.kernel
 def update_particles(dt: ti.f32):
@@ -362,10 +380,14 @@ def reset_simulation():
 # Particle system functions
 @ti.func
 def create_particles_at(x: ti.f32, y: ti.f32, r: ti.f32, g: ti.f32, b: ti.f32, count: ti.i32):
-    for i in range(count):
+    # Число частиц и емкость буфера задает регулятор качества
+    emit_count = ti.cast(count * particle_emission[None] + 0.5, ti.i32)
+    for i in range(emit_count):
+        if next_particle_id[None] >= particle_cap[None]:
+            next_particle_id[None] = 0
         if next_particle_id[None] < MAX_PARTICLES:
             p_id = next_particle_id[None]
-            next_particle_id[None] = (next_particle_id[None] + 1) % MAX_PARTICLES
+            next_particle_id[None] = (next_particle_id[None] + 1) % particle_cap[None]
             
             # If we're overwriting an active particle, decrement counter
             if p_active[p_id] == 1:
@@ -394,8 +416,8 @@ def create_particles_at(x: ti.f32, y: ti.f32, r: ti.f32, g: ti.f32, b: ti.f32, c
 def fill_pixels(pixels: ti.template(), t: ti.f32):
     for i, j in pixels:
         # Normalized coordinates
-        x = i / SCREEN_WIDTH
-        y = j / SCREEN_HEIGHT
+        x = i / pixels.shape[0]
+        y = j / pixels.shape[1]
         
         # Create gradient background
         r = 0.08 + y * 0.12
@@ -404,37 +426,57 @@ def fill_pixels(pixels: ti.template(), t: ti.f32):
         
         pixels[i, j] = ti.Vector([r, g, b, 1.0])
 
+# Interval of t where |k*t + m| <= half (empty when lo > hi)
+@ti.func
+def row_span(k, m, half):
+    lo, hi = -1e9, 1e9
+    if ti.abs(k) > 1e-6:
+        t0 = (-half - m) / k
+        t1 = (half - m) / k
+        lo = ti.min(t0, t1)
+        hi = ti.max(t0, t1)
+    elif ti.abs(m) > half:
+        lo, hi = 1.0, -1.0
+    return ti.Vector([lo, hi])
+
 # Draw objects to a pixel buffer
+# Координаты объектов - в пикселях экрана; буфер может быть меньше экрана (масштаб рендера)
 @ti.kernel
 def draw_objects(pixels: ti.template()):
+    width, height = pixels.shape[0], pixels.shape[1]
+    scale = pixels.shape[0] / SCREEN_WIDTH
     for i in range(MAX_OBJECTS):
         if active[i] == 1:
             # Get object properties
-            x, y = pos_x[i], pos_y[i]
-            obj_size = size[i]
+            x, y = pos_x[i] * scale, pos_y[i] * scale
+            obj_size = size[i] * scale
             r, g, b = color_r[i], color_g[i], color_b[i]
             obj_type_val = obj_type[i]
             rot = rotation[i]
             
             # Draw based on object type
             if obj_type_val == 0:  # Cube
-                # Draw a rotated square
+                # Draw a rotated square by inverse mapping: each row of the rotated
+                # bounding box is clipped to the square in object space, and the resulting span is filled
                 c = ti.cos(rot * 3.14159265 / 180.0)
                 s = ti.sin(rot * 3.14159265 / 180.0)
+                half = int(obj_size) + 0.5
+                extent = half * (ti.abs(c) + ti.abs(s))
                 
-                for dx in range(-int(obj_size), int(obj_size)+1):
-                    for dy in range(-int(obj_size), int(obj_size)+1):
-                        # Rotate point
-                        rx = dx * c - dy * s
-                        ry = dx * s + dy * c
-                        
-                        # Calculate pixel position
-                        px = int(x + rx)
-                        py = int(y + ry)
-                        
-                        # Draw if within screen bounds
-                        if 0 <= px < SCREEN_WIDTH and 0 <= py < SCREEN_HEIGHT:
-                            pixels[px, py] = ti.Vector([r, g, b, 1.0])
+                row_start = ti.max(int(ti.floor(y - extent)), 0)
+                row_end = ti.min(int(ti.floor(y + extent)), height - 1)
+                for py in range(row_start, row_end + 1):
+                    ey = py + 0.5 - y
+                    # Local coordinates along the row: lx = c*ex + s*ey, ly = -s*ex + c*ey
+                    span_x = row_span(c, s * ey, half)
+                    span_y = row_span(-s, c * ey, half)
+                    lo = ti.max(span_x[0], span_y[0])
+                    hi = ti.min(span_x[1], span_y[1])
+                    
+                    px_start = ti.max(int(ti.ceil(x + lo - 0.5)), 0)
+                    px_end = ti.min(int(ti.floor(x + hi - 0.5)), width - 1)
+                    for px in range(px_start, px_end + 1):
+                        pixels[px, py] = ti.Vector([r, g, b, 1.0])
                             
             elif obj_type_val == 1:  # Platform
                 # Draw a rectangle
@@ -445,39 +487,41 @@ def draw_objects(pixels: ti.template()):
                         px = int(x + dx)
                         py = int(y + dy)
                         
-                        if 0 <= px < SCREEN_WIDTH and 0 <= py < SCREEN_HEIGHT:
+                        if 0 <= px < width and 0 <= py < height:
                             pixels[px, py] = ti.Vector([r, g, b, 1.0])
                             
             elif obj_type_val == 2:  # Collectible
-                # Draw a circle
-                for dx in range(-int(obj_size), int(obj_size)+1):
-                    for dy in range(-int(obj_size), int(obj_size)+1):
-                        if dx*dx + dy*dy <= obj_size*obj_size:
+                # Draw a circle row by row: each row is one span of half-width sqrt(R^2 - dy^2)
+                for dy in range(-int(obj_size), int(obj_size)+1):
+                    py = int(y + dy)
+                    if 0 <= py < height:
+                        span = int(ti.sqrt(ti.max(obj_size*obj_size - dy*dy, 0.0)))
+                        for dx in range(-span, span+1):
                             px = int(x + dx)
-                            py = int(y + dy)
-                            
-                            if 0 <= px < SCREEN_WIDTH and 0 <= py < SCREEN_HEIGHT:
+                            if 0 <= px < width:
                                 pixels[px, py] = ti.Vector([r, g, b, 1.0])
 
 # Draw particles to a pixel buffer
 @ti.kernel
 def draw_particles(pixels: ti.template()):
+    width, height = pixels.shape[0], pixels.shape[1]
+    scale = pixels.shape[0] / SCREEN_WIDTH
     for i in range(MAX_PARTICLES):
         if p_active[i] == 1:
             # Get particle properties
-            x, y = p_pos_x[i], p_pos_y[i]
+            x, y = p_pos_x[i] * scale, p_pos_y[i] * scale
             r, g, b = p_color_r[i], p_color_g[i], p_color_b[i]
             alpha = p_life[i] / p_max_life[i]
-            particle_size = p_size[i]
+            particle_size = p_size[i] * scale
             
-            # Draw a small circle with alpha blending
-            for dx in range(-int(particle_size), int(particle_size)+1):
-                for dy in range(-int(particle_size), int(particle_size)+1):
-                    if dx*dx + dy*dy <= particle_size*particle_size:
+            # Draw a small circle with alpha blending, one span per row
+            for dy in range(-int(particle_size), int(particle_size)+1):
+                py = int(y + dy)
+                if 0 <= py < height:
+                    span = int(ti.sqrt(ti.max(particle_size*particle_size - dy*dy, 0.0)))
+                    for dx in range(-span, span+1):
                         px = int(x + dx)
-                        py = int(y + dy)
-                        
-                        if 0 <= px < SCREEN_WIDTH and 0 <= py < SCREEN_HEIGHT:
+                        if 0 <= px < width:
                             # Alpha blending
                             bg = pixels[px, py]
                             pixels[px, py] = ti.Vector([
@@ -487,6 +531,29 @@ def draw_particles(pixels: ti.template()):
                                 1.0
                             ])
 
+# Bilinear upscale of the internal render buffer to the screen-sized buffer
+@ti.kernel
+def upscale(src: ti.template(), dst: ti.template()):
+    sx = src.shape[0] / dst.shape[0]
+    sy = src.shape[1] / dst.shape[1]
+    for i, j in dst:
+        u = ti.max((i + 0.5) * sx - 0.5, 0.0)
+        v = ti.max((j + 0.5) * sy - 0.5, 0.0)
+        x0 = ti.min(int(u), src.shape[0] - 1)
+        y0 = ti.min(int(v), src.shape[1] - 1)
+        x1 = ti.min(x0 + 1, src.shape[0] - 1)
+        y1 = ti.min(y0 + 1, src.shape[1] - 1)
+        fx = u - x0
+        fy = v - y0
+        top = src[x0, y0] * (1 - fx) + src[x1, y0] * fx
+        bottom = src[x0, y1] * (1 - fx) + src[x1, y1] * fx
+        dst[i, j] = top * (1 - fy) + bottom * fy
+
+# Apply the governor's current quality level to the simulation fields
+def apply_quality(settings):
+    particle_emission[None] = settings['particle_emission'] if settings['particles_enabled'] else 0.0
+    particle_cap[None] = max(1, int(MAX_PARTICLES * settings['particle_cap']))
+
 # Main function
 def main():
     # Initialize simulation
@@ -498,12 +565,29 @@ def main():
     canvas = window.get_canvas()
     pixels = ti.Vector.field(4, dtype=ti.f32, shape=(SCREEN_WIDTH, SCREEN_HEIGHT))
     
+    # Буферы внутреннего разрешения (полный масштаб рисуется прямо в pixels)
+    render_targets = {
+        scale: pixels if scale == 1.0 else
+        ti.Vector.field(4, dtype=ti.f32, shape=(int(SCREEN_WIDTH * scale), int(SCREEN_HEIGHT * scale)))
+        for scale in RENDER_SCALES
+    }
+    
+    # Регулятор качества по времени кадра (клавиша G - зафиксировать текущий уровень)
+    governor = QualityGovernor(budget=FRAME_BUDGET)
+    apply_quality(governor.settings)
+    
     # For FPS calculation
     last_time = time.time()
     fps_values = []
     
+    # Запись кадров (клавиша C)
+    capture = None
+    
     # Main game loop
     while window.running:
+        # Начало работы кадра: время до window.show() не включает ожидание vsync
+        work_start = time.perf_counter()
+        
         # Calculate delta time
         current_time = time.time()
         dt = current_time - last_time
@@ -523,6 +607,20 @@ def main():
                 reset_simulation()
             elif e.key == 'f1':
                 debug_mode[None] = 1 - debug_mode[None]  # Toggle debug mode
+            elif e.key == 'g':
+                governor.enabled = not governor.enabled
+            elif e.key == 'c':
+                # Toggle frame capture
+                if capture is None:
+                    try:
+                        capture = FrameCapture((SCREEN_WIDTH, SCREEN_HEIGHT))
+                        print(f"Запись кадров начата: {capture.directory}")
+                    except (OSError, ValueError) as err:
+                        print(f"Запись кадров недоступна: {err}")
+                else:
+                    stats = capture.stop()
+                    print(f"Запись сохранена: {stats['written']} кадров, пропущено {stats['dropped']}")
+                    capture = None
         
         # Handle mouse clicks
         if window.is_pressed(ti.ui.LMB):
@@ -561,16 +659,25 @@ def main():
         if window.is_pressed('e'):
             camera_zoom[None] = min(2.0, camera_zoom[None] + 0.5 * dt)
         
+        settings = governor.settings
+        
         # Update physics
         update_physics(dt)
-        resolve_collisions()
+        for iteration in range(settings['collision_iterations']):
+            resolve_collisions(1 if iteration == 0 else 0)
         update_particles(dt)
         
-        # Render scene
-        fill_pixels(pixels, time.time())
-        draw_objects(pixels)
-        draw_particles(pixels)
+        # Render scene at the internal resolution, then upscale to the screen
+        scale = settings['render_scale'] if RENDER_SCALE == "auto" else RENDER_SCALE
+        target = render_targets[scale]
+        fill_pixels(target, time.time())
+        draw_objects(target)
+        draw_particles(target)
+        if target is not pixels:
+            upscale(target, pixels)
         canvas.set_image(pixels)
+        if capture is not None:
+            capture.capture_pixels(pixels)
         
         # Show debug info
         if debug_mode[None] == 1:
@@ -581,16 +688,31 @@ def main():
             avg_fps = sum(fps_values) / len(fps_values)
             
             # Draw debug text
-            window.GUI.begin("Debug", 0.01, 0.01, 0.2, 0.2)
+            window.GUI.begin("Debug", 0.01, 0.01, 0.35, 0.3)
             window.GUI.text(f"FPS: {int(avg_fps)}")
             window.GUI.text(f"Objects: {active_objects[None]}")
             window.GUI.text(f"Particles: {active_particles[None]}")
             window.GUI.text(f"Camera: ({camera_x[None]:.1f}, {camera_y[None]:.1f})")
             window.GUI.text(f"Zoom: {camera_zoom[None]:.2f}")
+            window.GUI.text(f"Render scale: {scale:.2f}{' (auto)' if RENDER_SCALE == 'auto' else ''}")
+            for line in governor.overlay_lines():
+                window.GUI.text(line)
+            if capture is not None:
+                window.GUI.text(f"REC: {capture.stats['captured']} frames ({capture.stats['dropped']} dropped)")
             window.GUI.end()
         
+        # Adapt quality (and the auto render scale) to the work time of the frame.
+        # Время между кадрами при vsync не опускается ниже периода обновления экрана,
+        # поэтому по нему масштаб мог бы только уменьшаться
+        work_time = time.perf_counter() - work_start
+        if governor.update(work_time):
+            apply_quality(governor.settings)
+        
         # Update window
         window.show()
+    
+    if capture is not None:
+        capture.stop()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,92 @@
+from collections import deque
+
+# Уровни качества, от самого дешевого к полному
+# particle_emission - множитель числа частиц на контакт, particle_cap - доля емкости буфера частиц,
+# collision_iterations - проходов разрешения столкновений за кадр, render_scale - масштаб рендера
+QUALITY_LEVELS = [
+    {'name': 'low', 'particles_enabled': False, 'particle_emission': 0.0, 'particle_cap': 0.25,
+     'collision_iterations': 1, 'render_scale': 0.5},
+    {'name': 'medium', 'particles_enabled': True, 'particle_emission': 0.5, 'particle_cap': 0.5,
+     'collision_iterations': 1, 'render_scale': 0.75},
+    {'name': 'high', 'particles_enabled': True, 'particle_emission': 1.0, 'particle_cap': 1.0,
+     'collision_iterations': 1, 'render_scale': 1.0},
+    {'name': 'ultra', 'particles_enabled': True, 'particle_emission': 1.0, 'particle_cap': 1.0,
+     'collision_iterations': 2, 'render_scale': 1.0},
+]
+
+# Адаптивное качество по бюджету времени кадра
+# Скользящее среднее за `window` кадров сравнивается с бюджетом: выше downgrade_ratio * budget -
+# уровень вниз, ниже upgrade_ratio * budget - вверх. Разрыв между порогами и пауза после
+# каждого переключения (гистерезис) не дают качеству колебаться каждый кадр.
+# В update передается время работы кадра (симуляция и рендер), а не интервал между кадрами:
+# при vsync интервал не бывает меньше периода экрана, и повышение уровня стало бы невозможным.
+class QualityGovernor:
+    def __init__(self, budget=1.0 / 60.0, window=30, downgrade_ratio=1.1, upgrade_ratio=0.75,
+                 cooldown=60, level=None, levels=QUALITY_LEVELS):
+        self.budget = budget
+        self.levels = levels
+        self.downgrade_ratio = downgrade_ratio
+        self.upgrade_ratio = upgrade_ratio
+        self.cooldown = cooldown
+        self.level = level if level is not None else len(levels) - 2
+        self.enabled = True
+
+        self.frame_times = deque(maxlen=window)
+        self.total = 0.0
+        self.wait = cooldown
+        self.last_change = None
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    @property
+    def average(self):
+        return self.total / len(self.frame_times) if self.frame_times else 0.0
+
+    # Record a frame's work time (seconds); returns True if the quality level changed
+    def update(self, dt):
+        if len(self.frame_times) == self.frame_times.maxlen:
+            self.total -= self.frame_times[0]
+        self.frame_times.append(dt)
+        self.total += dt
+
+        if not self.enabled:
+            return False
+        if self.wait > 0:
+            self.wait -= 1
+            return False
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return False
+
+        average = self.average
+        if average > self.budget * self.downgrade_ratio and self.level > 0:
+            return self._set_level(self.level - 1, 'down')
+        if average < self.budget * self.upgrade_ratio and self.level < len(self.levels) - 1:
+            return self._set_level(self.level + 1, 'up')
+        return False
+
+    def _set_level(self, level, direction):
+        self.last_change = f"{direction}: {self.levels[self.level]['name']} -> {self.levels[level]['name']} " \
+                           f"({self.average * 1000:.1f} ms)"
+        self.level = level
+        self.wait = self.cooldown
+
+        # Среднее после переключения считаем заново
+        self.frame_times.clear()
+        self.total = 0.0
+        return True
+
+    # Текущие решения для отладочного оверлея
+    def overlay_lines(self):
+        settings = self.settings
+        lines = [
+            f"Quality: {settings['name']}{'' if self.enabled else ' (fixed)'} "
+            f"avg {self.average * 1000:.1f} / {self.budget * 1000:.1f} ms",
+            f"Particles: {'on' if settings['particles_enabled'] else 'off'} "
+            f"x{settings['particle_emission']:.2f}, cap {settings['particle_cap']:.0%}",
+            f"Collision iterations: {settings['collision_iterations']}, render scale {settings['render_scale']:.2f}",
+        ]
+        if self.last_change:
+            lines.append(f"Last change {self.last_change}")
+        return lines
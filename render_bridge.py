@@ -0,0 +1,71 @@
+from cube_manager import CubeManager
+
+# Мост GameState -> CubeManager
+# Хранит соответствие id объекта GameState и индекса экземпляра в CubeManager
+# и применяет только изменения кадра: появления, исчезновения и сдвинутые объекты
+class RenderBridge:
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.cube_manager = CubeManager(renderer)
+        self.index_by_id = {}
+        self.id_by_index = []
+
+    # Transform of a GameState object in CubeManager terms: (position, rotation, scale)
+    @staticmethod
+    def object_transform(obj):
+        position = [obj['position'][0], obj['position'][1], 0.0]
+        size = obj['size']
+        if obj['type'] == 'collectible':
+            # Монетки вращаются вокруг оси Y и сплющены
+            return position, [0, obj['rotation'], 0], [size, size * 0.2, size]
+        return position, [0, 0, obj.get('rotation', 0.0)], [size, size, size]
+
+    def spawn(self, obj):
+        if obj['id'] in self.index_by_id:
+            return
+        position, rotation, scale = self.object_transform(obj)
+        color = obj.get('color')
+        if color is None:
+            color = [0.8, 0.2, 0.2] if not obj.get('fixed', False) else [0.3, 0.3, 0.8]
+        index = self.cube_manager.add_instance(position, rotation, scale, list(color))
+        self.index_by_id[obj['id']] = index
+        self.id_by_index.append(obj['id'])
+
+    def despawn(self, obj_id):
+        index = self.index_by_id.pop(obj_id, None)
+        if index is None:
+            return
+        moved = self.cube_manager.remove_cube(index)
+        last_id = self.id_by_index.pop()
+        if moved is not None:
+            # Последний экземпляр переехал на место удаленного
+            self.id_by_index[index] = last_id
+            self.index_by_id[last_id] = index
+
+    def clear(self):
+        self.cube_manager.clear()
+        self.index_by_id.clear()
+        self.id_by_index.clear()
+
+    # Применить изменения GameState за кадр; стоимость O(изменений)
+    def sync(self, state):
+        reset, spawned, despawned, dirty = state.pop_render_changes()
+
+        if reset:
+            self.clear()
+            for obj in state.cubes:
+                if obj.get('active', False):
+                    self.spawn(obj)
+            return
+
+        for obj_id in despawned:
+            self.despawn(obj_id)
+
+        for obj in spawned:
+            if obj.get('active', False):
+                self.spawn(obj)
+
+        for obj_id, obj in dirty.items():
+            index = self.index_by_id.get(obj_id)
+            if index is not None:
+                self.cube_manager.set_transform(index, *self.object_transform(obj))
@@ -0,0 +1,75 @@
+import numpy as np
+
+# Очередь отрисовки кадра
+# Отправленные пакеты экземпляров делятся на непрозрачный и прозрачный проходы:
+# непрозрачные склеиваются по конвейеру (шейдер + состояние) в один вызов,
+# прозрачные сортируются от дальних к ближним и рисуются сериями одного конвейера
+# У всех конвейеров первые три столбца данных экземпляра - позиция в мире
+
+PASS_OPAQUE = 0
+PASS_TRANSPARENT = 1
+
+class RenderQueue:
+    def __init__(self):
+        self.batches = {PASS_OPAQUE: {}, PASS_TRANSPARENT: {}}
+
+    # Queue (N, K) float32 instance data for a pipeline; the data is copied
+    def submit(self, pipeline, data, transparent=False):
+        if len(data) == 0:
+            return
+        render_pass = PASS_TRANSPARENT if transparent else PASS_OPAQUE
+        batches = self.batches[render_pass]
+        batches.setdefault(pipeline, []).append(np.array(data, dtype='f4'))
+
+    def clear(self):
+        for batches in self.batches.values():
+            batches.clear()
+
+    def is_empty(self):
+        return not any(self.batches.values())
+
+    # Opaque pass: one (pipeline, data) batch per pipeline, in a fixed pipeline order
+    def opaque_batches(self):
+        batches = self.batches[PASS_OPAQUE]
+        for pipeline in sorted(batches):
+            parts = batches[pipeline]
+            yield pipeline, parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    # Transparent pass: instances sorted back-to-front by view-space depth,
+    # split into runs of consecutive instances that share a pipeline
+    # Точный порядок смешивания важнее числа вызовов: если конвейеры чередуются по глубине
+    # (например, прозрачные кубы вперемешку с частицами), серии вырождаются до одного
+    # экземпляра и проход стоит один вызов отрисовки на экземпляр
+    def transparent_runs(self, view):
+        batches = self.batches[PASS_TRANSPARENT]
+        if not batches:
+            return
+
+        pipelines = sorted(batches)
+        datas = [np.concatenate(batches[pipeline]) for pipeline in pipelines]
+        if len(datas) == 1:
+            order = self._back_to_front(datas[0], view)
+            yield pipelines[0], datas[0][order]
+            return
+
+        # Общая сортировка по глубине для всех конвейеров
+        positions = np.concatenate([data[:, :3] for data in datas])
+        owners = np.concatenate([np.full(len(data), i, dtype=np.int32) for i, data in enumerate(datas)])
+        rows = np.concatenate([np.arange(len(data)) for data in datas])
+        order = self._back_to_front(positions, view)
+        owners = owners[order]
+        rows = rows[order]
+
+        # Границы серий, где меняется конвейер
+        starts = np.flatnonzero(np.diff(owners)) + 1
+        for run_owner, run_rows in zip(np.split(owners, starts), np.split(rows, starts)):
+            owner = int(run_owner[0])
+            yield pipelines[owner], datas[owner][run_rows]
+
+    @staticmethod
+    def _back_to_front(data, view):
+        # Глубина в пространстве камеры: камера смотрит вдоль -z, дальние имеют меньший z
+        # view - матрица по строкам (как Renderer.view_matrix, до транспонирования для GPU)
+        view = np.asarray(view, dtype='f4')
+        depth = data[:, :3] @ view[2, :3] + view[2, 3]
+        return np.argsort(depth, kind='stable')
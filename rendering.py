@@ -3,86 +3,369 @@ import config
 import numpy as np
 import moderngl
 import moderngl_window as mglw
-from moderngl_window.context.pyglet.window import Window
 from moderngl_window import resources
 from pathlib import Path
-import random
 import time
+import shader_registry
+from render_queue import RenderQueue
+
+# Cube mesh: position + normal per vertex (24 vertices, 4 per face)
+CUBE_VERTICES = np.array([
+    # Front face
+    -0.5, -0.5,  0.5,  0.0,  0.0,  1.0,
+     0.5, -0.5,  0.5,  0.0,  0.0,  1.0,
+     0.5,  0.5,  0.5,  0.0,  0.0,  1.0,
+    -0.5,  0.5,  0.5,  0.0,  0.0,  1.0,
+    # Back face
+    -0.5, -0.5, -0.5,  0.0,  0.0, -1.0,
+     0.5, -0.5, -0.5,  0.0,  0.0, -1.0,
+     0.5,  0.5, -0.5,  0.0,  0.0, -1.0,
+    -0.5,  0.5, -0.5,  0.0,  0.0, -1.0,
+    # Top face
+    -0.5,  0.5, -0.5,  0.0,  1.0,  0.0,
+     0.5,  0.5, -0.5,  0.0,  1.0,  0.0,
+     0.5,  0.5,  0.5,  0.0,  1.0,  0.0,
+    -0.5,  0.5,  0.5,  0.0,  1.0,  0.0,
+    # Bottom face
+    -0.5, -0.5, -0.5,  0.0, -1.0,  0.0,
+     0.5, -0.5, -0.5,  0.0, -1.0,  0.0,
+     0.5, -0.5,  0.5,  0.0, -1.0,  0.0,
+    -0.5, -0.5,  0.5,  0.0, -1.0,  0.0,
+    # Right face
+     0.5, -0.5, -0.5,  1.0,  0.0,  0.0,
+     0.5,  0.5, -0.5,  1.0,  0.0,  0.0,
+     0.5,  0.5,  0.5,  1.0,  0.0,  0.0,
+     0.5, -0.5,  0.5,  1.0,  0.0,  0.0,
+    # Left face
+    -0.5, -0.5, -0.5, -1.0,  0.0,  0.0,
+    -0.5,  0.5, -0.5, -1.0,  0.0,  0.0,
+    -0.5,  0.5,  0.5, -1.0,  0.0,  0.0,
+    -0.5, -0.5,  0.5, -1.0,  0.0,  0.0,
+], dtype='f4')
+
+# Indices for drawing the 12 triangles (6 faces * 2 triangles)
+CUBE_INDICES = np.array([
+    0, 1, 2, 2, 3, 0,  # Front face
+    4, 5, 6, 6, 7, 4,  # Back face
+    8, 9, 10, 10, 11, 8,  # Top face
+    12, 13, 14, 14, 15, 12,  # Bottom face
+    16, 17, 18, 18, 19, 16,  # Right face
+    20, 21, 22, 22, 23, 20,  # Left face
+], dtype='i4')
+
+# Cube shaders for per-object drawing (model/view/projection uniforms)
+# Кубы рисуются инстансингом (INSTANCED_*); эта программа и cube_vao оставлены только для
+# load_model_obj, который возвращает VAO модели для покадровой отрисовки с uniform-матрицами.
+# Освещение здесь и в INSTANCED_FRAGMENT_SHADER одинаковое - менять их нужно вместе
+CUBE_VERTEX_SHADER = """
+    #version 330 core
+    
+    uniform mat4 model;
+    uniform mat4 view;
+    uniform mat4 projection;
+    
+    in vec3 in_position;
+    in vec3 in_normal;
+    
+    out vec3 normal;
+    out vec3 frag_pos;
+    
+    void main() {
+        // For 2D, we use the full transformation pipeline as usual
+        gl_Position = projection * view * model * vec4(in_position, 1.0);
+        
+        // Pass normal and position to fragment shader (used for lighting)
+        normal = normalize(mat3(transpose(inverse(model))) * in_normal);
+        frag_pos = vec3(model * vec4(in_position, 1.0));
+    }
+"""
+
+CUBE_FRAGMENT_SHADER = """
+    #version 330 core
+    
+    uniform vec4 color;
+    
+    in vec3 normal;
+    in vec3 frag_pos;
+    
+    out vec4 fragColor;
+    
+    void main() {
+        // Basic lighting for 2D
+        float ambient_strength = 0.7;  // Увеличил ambient для лучшей видимости в 2D
+        vec3 ambient = ambient_strength * vec3(1.0, 1.0, 1.0);
+        
+        // Simple directional light from top-right
+        vec3 light_dir = normalize(vec3(1.0, 1.0, 0.5));
+        float diff = max(dot(normal, light_dir), 0.0);
+        vec3 diffuse = diff * vec3(0.5, 0.5, 0.5);
+        
+        // Combine lighting
+        vec3 result = (ambient + diffuse) * color.rgb;
+        
+        // Output final color with alpha
+        fragColor = vec4(result, color.a);
+    }
+"""
+
+# Per-frame camera uniforms shared by all instanced shaders (std140: two mat4)
+CAMERA_BLOCK = """
+    layout(std140) uniform Camera {
+        mat4 view;
+        mat4 projection;
+    };
+"""
+CAMERA_BLOCK_BINDING = 0
+CAMERA_BLOCK_SIZE = 2 * 16 * 4
+
+# Матрицы в NumPy хранятся по строкам (m[row, col], перенос в последнем столбце),
+# а GLSL читает mat4 из блока std140 по столбцам - при загрузке транспонируем
+def matrix_bytes(matrix):
+    return np.ascontiguousarray(np.asarray(matrix).T, dtype='f4').tobytes()
+
+# Instanced cube shaders: transform and colour come from a per-instance buffer
+INSTANCED_VERTEX_SHADER = """
+    #version 330 core
+    """ + CAMERA_BLOCK + """
+    
+    in vec3 in_position;
+    in vec3 in_normal;
+    
+    // Per-instance attributes
+    in vec3 in_offset;
+    in vec3 in_scale;
+    in vec4 in_color;
+    in vec3 in_rotation;  // Углы Эйлера в градусах, порядок X, Y, Z
+    
+    out vec3 normal;
+    out vec3 frag_pos;
+    out vec4 color;
+    
+    mat3 rotation_matrix(vec3 angles) {
+        vec3 c = cos(radians(angles));
+        vec3 s = sin(radians(angles));
+        mat3 rx = mat3(1.0, 0.0, 0.0, 0.0, c.x, s.x, 0.0, -s.x, c.x);
+        mat3 ry = mat3(c.y, 0.0, -s.y, 0.0, 1.0, 0.0, s.y, 0.0, c.y);
+        mat3 rz = mat3(c.z, s.z, 0.0, -s.z, c.z, 0.0, 0.0, 0.0, 1.0);
+        return rz * ry * rx;
+    }
+    
+    void main() {
+        mat3 rotation = rotation_matrix(in_rotation);
+        vec3 world_pos = rotation * (in_position * in_scale) + in_offset;
+        gl_Position = projection * view * vec4(world_pos, 1.0);
+        
+        // Inverse-transpose of a diagonal scale matrix is 1/scale; the rotation is orthonormal
+        normal = normalize(rotation * (in_normal / in_scale));
+        frag_pos = world_pos;
+        color = in_color;
+    }
+"""
+
+INSTANCED_FRAGMENT_SHADER = """
+    #version 330 core
+    
+    in vec3 normal;
+    in vec3 frag_pos;
+    in vec4 color;
+    
+    out vec4 fragColor;
+    
+    void main() {
+        float ambient_strength = 0.7;
+        vec3 ambient = ambient_strength * vec3(1.0, 1.0, 1.0);
+        
+        vec3 light_dir = normalize(vec3(1.0, 1.0, 0.5));
+        float diff = max(dot(normal, light_dir), 0.0);
+        vec3 diffuse = diff * vec3(0.5, 0.5, 0.5);
+        
+        vec3 result = (ambient + diffuse) * color.rgb;
+        fragColor = vec4(result, color.a);
+    }
+"""
+
+# Instance layout: offset (3f), scale (3f), colour (4f), rotation in degrees (3f)
+INSTANCE_FLOATS = 13
+INSTANCE_FORMAT = '3f 3f 4f 3f/i'
+
+# Particle sprites: camera-facing quads, one instance per particle
+PARTICLE_VERTEX_SHADER = """
+    #version 330 core
+    """ + CAMERA_BLOCK + """
+    
+    in vec2 in_corner;
+    
+    // Per-instance attributes
+    in vec3 in_center;
+    in float in_size;
+    in vec4 in_color;
+    
+    out vec2 corner;
+    out vec4 color;
+    
+    void main() {
+        // Угол квада сдвигается в пространстве камеры, поэтому спрайт всегда смотрит на камеру
+        vec4 view_pos = view * vec4(in_center, 1.0);
+        view_pos.xy += in_corner * in_size;
+        gl_Position = projection * view_pos;
+        
+        corner = in_corner * 2.0;
+        color = in_color;
+    }
+"""
+
+PARTICLE_FRAGMENT_SHADER = """
+    #version 330 core
+    
+    in vec2 corner;
+    in vec4 color;
+    
+    out vec4 fragColor;
+    
+    void main() {
+        // Мягкий круглый спрайт
+        float fade = 1.0 - smoothstep(0.7, 1.0, length(corner));
+        if (fade <= 0.0) {
+            discard;
+        }
+        fragColor = vec4(color.rgb, color.a * fade);
+    }
+"""
+
+# Quad corners for a triangle strip
+PARTICLE_QUAD = np.array([
+    -0.5, -0.5,
+     0.5, -0.5,
+    -0.5,  0.5,
+     0.5,  0.5,
+], dtype='f4')
+
+# Particle instance layout: center (3f), size (1f), colour (4f)
+PARTICLE_FLOATS = 8
+PARTICLE_FORMAT = '3f 1f 4f/i'
+
+# Конвейеры очереди отрисовки
+PIPELINE_CUBES = 'cubes'
+PIPELINE_PARTICLES = 'particles'
+
+# Единственный источник исходников шейдеров: имя программы -> (вершинный, фрагментный)
+SHADER_SOURCES = {
+    'cube': (CUBE_VERTEX_SHADER, CUBE_FRAGMENT_SHADER),  # только для load_model_obj
+    'instanced_cube': (INSTANCED_VERTEX_SHADER, INSTANCED_FRAGMENT_SHADER),
+    'particle': (PARTICLE_VERTEX_SHADER, PARTICLE_FRAGMENT_SHADER),
+}
 
 # Класс для хранения и управления частицами
+# Частицы лежат в предвыделенных массивах NumPy, используемых как кольцевой буфер: живые занимают
+# подряд (по модулю емкости) слоты [head - alive_count, head), от старых к новым.
+# emit пишет с head и при переполнении перезаписывает самые старые частицы на месте - O(count);
+# update уплотняет выжившие частицы в начало массивов, поэтому стоит O(живых), а не O(емкости)
 class ParticleSystem:
-    def __init__(self, renderer):
+    GRAVITY = 5.0
+    SHRINK_RATE = 0.5
+    
+    def __init__(self, renderer, max_particles=None):
         self.renderer = renderer
-        self.max_particles = 100
-        self.particles = []
+        self.max_particles = max_particles if max_particles is not None else config.particles_max_count
         self.lifetime = 1.0  # в секундах
+        self.rng = np.random.default_rng()
         
+        n = self.max_particles
+        self.positions = np.zeros((n, 3), dtype='f4')
+        self.velocities = np.zeros((n, 3), dtype='f4')
+        self.sizes = np.zeros(n, dtype='f4')
+        self.colors = np.zeros((n, 4), dtype='f4')
+        self.ages = np.zeros(n, dtype='f4')
+        self.lifetimes = np.ones(n, dtype='f4')
+        self.head = 0  # Следующий слот для записи
+        self.alive_count = 0
+    
+    def _arrays(self):
+        return (self.positions, self.velocities, self.sizes, self.colors, self.ages, self.lifetimes)
+    
+    # Слоты `count` частиц, начиная с кольцевого индекса start: срез или (если диапазон
+    # переходит через конец буфера) массив индексов
+    def _ring(self, start, count):
+        if start + count <= self.max_particles:
+            return slice(start, start + count)
+        return (start + np.arange(count)) % self.max_particles
+    
+    # Слоты живых частиц, от старых к новым
+    def _live(self):
+        return self._ring((self.head - self.alive_count) % self.max_particles, self.alive_count)
+    
+    # Emit `count` particles at once; when full, the oldest particles are overwritten
     def emit_particles(self, position, color, count=10):
-        for _ in range(count):
-            # Если достигли максимума частиц, заменяем самую старую
-            if len(self.particles) >= self.max_particles:
-                self.particles.pop(0)
-                
-            # Создаем новую частицу
-            particle = {
-                'position': [position[0], position[1], 0.0],
-                'velocity': [
-                    random.uniform(-2.0, 2.0),
-                    random.uniform(0.5, 3.0),
-                    0.0
-                ],
-                'size': random.uniform(0.05, 0.2),
-                'color': [
-                    color[0] + random.uniform(-0.1, 0.1),
-                    color[1] + random.uniform(-0.1, 0.1),
-                    color[2] + random.uniform(-0.1, 0.1),
-                    1.0
-                ],
-                'creation_time': time.time(),
-                'lifetime': random.uniform(0.5, self.lifetime)
-            }
-            self.particles.append(particle)
+        count = min(int(count), self.max_particles)
+        if count <= 0:
+            return
+        
+        # Слоты после head; если буфер полон, это слоты самых старых частиц
+        slots = self._ring(self.head, count)
+        self.head = (self.head + count) % self.max_particles
+        self.alive_count = min(self.alive_count + count, self.max_particles)
+        
+        rng = self.rng
+        self.positions[slots] = (position[0], position[1], 0.0)
+        self.velocities[slots, 0] = rng.uniform(-2.0, 2.0, count)
+        self.velocities[slots, 1] = rng.uniform(0.5, 3.0, count)
+        self.velocities[slots, 2] = 0.0
+        self.sizes[slots] = rng.uniform(0.05, 0.2, count)
+        self.colors[slots, :3] = np.asarray(color[:3], dtype='f4') + rng.uniform(-0.1, 0.1, (count, 3))
+        self.colors[slots, 3] = 1.0
+        self.ages[slots] = 0.0
+        self.lifetimes[slots] = rng.uniform(0.5, self.lifetime, count)
     
     def update(self, dt):
-        # Текущее время
-        current_time = time.time()
+        n = self.alive_count
+        if n == 0:
+            return
         
-        # Обновляем каждую частицу
-        i = 0
-        while i < len(self.particles):
-            particle = self.particles[i]
-            
-            # Проверяем истечение времени жизни
-            age = current_time - particle['creation_time']
-            if age >= particle['lifetime']:
-                # Удаляем частицу
-                self.particles.pop(i)
-                continue
-                
-            # Обновляем положение частицы
-            particle['position'][0] += particle['velocity'][0] * dt
-            particle['position'][1] += particle['velocity'][1] * dt
-            
-            # Применяем гравитацию
-            particle['velocity'][1] -= 5.0 * dt
-            
-            # Обновляем прозрачность (выцветание)
-            remaining_life = 1.0 - age / particle['lifetime']
-            particle['color'][3] = remaining_life
-            
-            # Уменьшаем размер с течением времени
-            particle['size'] *= (1.0 - 0.5 * dt)
-            
-            i += 1
+        # Живые частицы переходят через конец буфера - один раз переносим их в начало
+        live = self._live()
+        if not isinstance(live, slice):
+            for array in self._arrays():
+                array[:n] = array[live]
+            self.head = n % self.max_particles
+            live = slice(0, n)
+        
+        # Старение и удаление частиц с истекшим временем жизни
+        self.ages[live] += dt
+        keep = self.ages[live] < self.lifetimes[live]
+        if not keep.all():
+            # Уплотняем живые частицы в начало массивов (порядок от старых к новым сохраняется)
+            n = int(keep.sum())
+            for array in self._arrays():
+                array[:n] = array[live][keep]
+            self.alive_count = n
+            self.head = n % self.max_particles
+            if n == 0:
+                return
+            live = slice(0, n)
+        
+        # Обновляем положение частиц
+        self.positions[live] += self.velocities[live] * dt
+        
+        # Применяем гравитацию
+        self.velocities[live, 1] -= self.GRAVITY * dt
+        
+        # Обновляем прозрачность (выцветание)
+        self.colors[live, 3] = np.maximum(1.0 - self.ages[live] / self.lifetimes[live], 0.0)
+        
+        # Уменьшаем размер с течением времени
+        self.sizes[live] *= (1.0 - self.SHRINK_RATE * dt)
+    
+    def clear(self):
+        self.head = 0
+        self.alive_count = 0
     
     def render(self):
-        # Рендерим каждую частицу
-        for particle in self.particles:
-            self.renderer.draw_cube(
-                particle['position'],
-                [particle['size']] * 3,
-                particle['color']
-            )
+        if self.alive_count == 0:
+            return
+        
+        # Все живые частицы - одним вызовом отрисовки спрайтов
+        live = self._live()
+        self.renderer.draw_particles(self.positions[live], self.sizes[live], self.colors[live])
 
 # Renderer class for the gravity cubes simulation
 class Renderer(mglw.WindowConfig):
@@ -95,12 +378,20 @@ class Renderer(mglw.WindowConfig):
         # Shaders
         self.shader_dir = 'shaders'
         
-        # Создаем шейдеры вручную, так как файлов больше нет
+        # Шейдеры берутся из реестра (исходники - SHADER_SOURCES)
         self.create_shaders()
         
+        self.fbo = None
+        self.frame_capture = None
+        
         # Create cube mesh
         self.cube_vao = self.create_cube_vao()
         
+        # Общие uniform-данные камеры, инстансинг кубов и спрайтов частиц
+        self.create_camera_uniforms()
+        self.create_instanced_pipeline()
+        self.create_particle_pipeline()
+        
         # Mode flag: 2D or 3D
         self.is_2d = False
         
@@ -119,7 +410,7 @@ class Renderer(mglw.WindowConfig):
         
         # Projection matrix
         self.aspect_ratio = self.wnd.width / self.wnd.height
-        self.projection = self.get_projection_matrix()
+        self.set_projection(self.get_projection_matrix())
         
         # Градиентный фон
         self.background_colors = [
@@ -133,75 +424,26 @@ class Renderer(mglw.WindowConfig):
         # Mouse capture
         self.cursor = self.mouse_exclusivity = True
         
-    # Создаем шейдеры вручную
+    # Программа куба из реестра шейдеров (для VAO моделей, см. load_model_obj)
     def create_shaders(self):
-        # Вершинный шейдер
-        vertex_shader = """
-            #version 330 core
-            
-            uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
-            
-            in vec3 in_position;
-            in vec3 in_normal;
-            
-            out vec3 normal;
-            out vec3 frag_pos;
-            
-            void main() {
-                // For 2D, we use the full transformation pipeline as usual
-                gl_Position = projection * view * model * vec4(in_position, 1.0);
-                
-                // Pass normal and position to fragment shader (used for lighting)
-                normal = normalize(mat3(transpose(inverse(model))) * in_normal);
-                frag_pos = vec3(model * vec4(in_position, 1.0));
-            }
-        """
-        
-        # Фрагментный шейдер
-        fragment_shader = """
-            #version 330 core
-            
-            uniform vec4 color;
-            
-            in vec3 normal;
-            in vec3 frag_pos;
-            
-            out vec4 fragColor;
-            
-            void main() {
-                // Basic lighting for 2D
-                float ambient_strength = 0.7;  // Увеличил ambient для лучшей видимости в 2D
-                vec3 ambient = ambient_strength * vec3(1.0, 1.0, 1.0);
-                
-                // Simple directional light from top-right
-                vec3 light_dir = normalize(vec3(1.0, 1.0, 0.5));
-                float diff = max(dot(normal, light_dir), 0.0);
-                vec3 diffuse = diff * vec3(0.5, 0.5, 0.5);
-                
-                // Combine lighting
-                vec3 result = (ambient + diffuse) * color.rgb;
-                
-                // Output final color with alpha
-                fragColor = vec4(result, color.a);
-            }
-        """
-        
-        # Создаем шейдерную программу
-        self.cube_shader = self.ctx.program(
-            vertex_shader=vertex_shader,
-            fragment_shader=fragment_shader
-        )
+        self.cube_shader = self.load_program('cube')
     
     # Static method to create a Renderer instance from an existing WindowConfig instance
     @staticmethod
     def _wrap(window_config):
+        wnd = window_config.wnd
+        return Renderer._from_context(window_config.ctx, wnd, wnd.width, wnd.height)
+    
+    # Create a Renderer on an existing moderngl context (wnd is None when offscreen)
+    @staticmethod
+    def _from_context(ctx, wnd, width, height):
         renderer = Renderer.__new__(Renderer)
         
         # Copy all attributes from window_config
-        renderer.ctx = window_config.ctx
-        renderer.wnd = window_config.wnd
+        renderer.ctx = ctx
+        renderer.wnd = wnd
+        renderer.fbo = None
+        renderer.frame_capture = None
         
         # Initialize renderer properties
         renderer.shader_dir = 'shaders'
@@ -210,8 +452,8 @@ class Renderer(mglw.WindowConfig):
         renderer.camera_front = np.array([0.0, 0.0, -1.0])
         renderer.camera_up = np.array([0.0, 1.0, 0.0])
         renderer.camera_right = np.array([1.0, 0.0, 0.0])
-        renderer.aspect_ratio = window_config.wnd.width / window_config.wnd.height
-        renderer.projection = np.identity(4)  # Will be updated later
+        renderer.aspect_ratio = width / height
+        renderer.set_projection(np.identity(4))  # Will be updated later
         
         # Градиентный фон
         renderer.background_colors = [
@@ -219,367 +461,82 @@ class Renderer(mglw.WindowConfig):
             (0.2, 0.4, 0.6, 1.0)     # Голубой сверху
         ]
         
-        # Создаем шейдеры вручную
-        # Вершинный шейдер
-        vertex_shader = """
-            #version 330 core
-            
-            uniform mat4 model;
-            uniform mat4 view;
-            uniform mat4 projection;
-            
-            in vec3 in_position;
-            in vec3 in_normal;
-            
-            out vec3 normal;
-            out vec3 frag_pos;
-            
-            void main() {
-                // For 2D, we use the full transformation pipeline as usual
-                gl_Position = projection * view * model * vec4(in_position, 1.0);
-                
-                // Pass normal and position to fragment shader (used for lighting)
-                normal = normalize(mat3(transpose(inverse(model))) * in_normal);
-                frag_pos = vec3(model * vec4(in_position, 1.0));
-            }
-        """
-        
-        # Фрагментный шейдер
-        fragment_shader = """
-            #version 330 core
-            
-            uniform vec4 color;
-            
-            in vec3 normal;
-            in vec3 frag_pos;
-            
-            out vec4 fragColor;
-            
-            void main() {
-                // Basic lighting for 2D
-                float ambient_strength = 0.7;  // Увеличил ambient для лучшей видимости в 2D
-                vec3 ambient = ambient_strength * vec3(1.0, 1.0, 1.0);
-                
-                // Simple directional light from top-right
-                vec3 light_dir = normalize(vec3(1.0, 1.0, 0.5));
-                float diff = max(dot(normal, light_dir), 0.0);
-                vec3 diffuse = diff * vec3(0.5, 0.5, 0.5);
-                
-                // Combine lighting
-                vec3 result = (ambient + diffuse) * color.rgb;
-                
-                // Output final color with alpha
-                fragColor = vec4(result, color.a);
-            }
-        """
-        
-        # Создаем шейдерную программу
-        renderer.cube_shader = window_config.ctx.program(
-            vertex_shader=vertex_shader,
-            fragment_shader=fragment_shader
-        )
-        
-        # Создаем VAO для куба
-        # Cube vertices (8 corners)
-        vertices = np.array([
-            # Front face
-            -0.5, -0.5,  0.5,  0.0,  0.0,  1.0,
-             0.5, -0.5,  0.5,  0.0,  0.0,  1.0,
-             0.5,  0.5,  0.5,  0.0,  0.0,  1.0,
-            -0.5,  0.5,  0.5,  0.0,  0.0,  1.0,
-            # Back face
-            -0.5, -0.5, -0.5,  0.0,  0.0, -1.0,
-             0.5, -0.5, -0.5,  0.0,  0.0, -1.0,
-             0.5,  0.5, -0.5,  0.0,  0.0, -1.0,
-            -0.5,  0.5, -0.5,  0.0,  0.0, -1.0,
-            # Top face
-            -0.5,  0.5, -0.5,  0.0,  1.0,  0.0,
-             0.5,  0.5, -0.5,  0.0,  1.0,  0.0,
-             0.5,  0.5,  0.5,  0.0,  1.0,  0.0,
-            -0.5,  0.5,  0.5,  0.0,  1.0,  0.0,
-            # Bottom face
-            -0.5, -0.5, -0.5,  0.0, -1.0,  0.0,
-             0.5, -0.5, -0.5,  0.0, -1.0,  0.0,
-             0.5, -0.5,  0.5,  0.0, -1.0,  0.0,
-            -0.5, -0.5,  0.5,  0.0, -1.0,  0.0,
-            # Right face
-             0.5, -0.5, -0.5,  1.0,  0.0,  0.0,
-             0.5,  0.5, -0.5,  1.0,  0.0,  0.0,
-             0.5,  0.5,  0.5,  1.0,  0.0,  0.0,
-             0.5, -0.5,  0.5,  1.0,  0.0,  0.0,
-            # Left face
-            -0.5, -0.5, -0.5, -1.0,  0.0,  0.0,
-            -0.5,  0.5, -0.5, -1.0,  0.0,  0.0,
-            -0.5,  0.5,  0.5, -1.0,  0.0,  0.0,
-            -0.5, -0.5,  0.5, -1.0,  0.0,  0.0,
-        ], dtype='f4')
+        # Шейдеры и VAO куба
+        renderer.create_shaders()
+        renderer.cube_vao = renderer.create_cube_vao()
         
-        # Indices for drawing the 12 triangles (6 faces * 2 triangles)
-        indices = np.array([
-            0, 1, 2, 2, 3, 0,  # Front face
-            4, 5, 6, 6, 7, 4,  # Back face
-            8, 9, 10, 10, 11, 8,  # Top face
-            12, 13, 14, 14, 15, 12,  # Bottom face
-            16, 17, 18, 18, 19, 16,  # Right face
-            20, 21, 22, 22, 23, 20,  # Left face
-        ], dtype='i4')
-        
-        # Create VAO, VBO and EBO
-        try:
-            vbo = window_config.ctx.buffer(vertices.tobytes())
-            ebo = window_config.ctx.buffer(indices.tobytes())
-            
-            renderer.cube_vao = window_config.ctx.vertex_array(
-                renderer.cube_shader,
-                [
-                    (vbo, '3f 3f', 'in_position', 'in_normal'),
-                ],
-                ebo
-            )
-        except Exception as e:
-            print(f"Error creating cube VAO: {e}")
-            raise
+        # Общие uniform-данные камеры, инстансинг кубов и спрайтов частиц
+        renderer.create_camera_uniforms()
+        renderer.create_instanced_pipeline()
+        renderer.create_particle_pipeline()
             
         # Создаем систему частиц
         renderer.particle_system = ParticleSystem(renderer)
         
         return renderer
     
-    # Load program from files (for _wrap method)
+    # Offscreen renderer: standalone context (no window) rendering into a framebuffer
+    # backend - бэкенд moderngl/glcontext, например 'egl' для Linux без дисплея
     @staticmethod
-    def load_program(name, window_config):
-        # Больше не используем файлы шейдеров, вместо этого используем строковые константы
-        if name == 'cube':
-            # Вершинный шейдер
-            vertex_shader = """
-                #version 330 core
-                
-                uniform mat4 model;
-                uniform mat4 view;
-                uniform mat4 projection;
-                
-                in vec3 in_position;
-                in vec3 in_normal;
-                
-                out vec3 normal;
-                out vec3 frag_pos;
-                
-                void main() {
-                    // For 2D, we use the full transformation pipeline as usual
-                    gl_Position = projection * view * model * vec4(in_position, 1.0);
-                    
-                    // Pass normal and position to fragment shader (used for lighting)
-                    normal = normalize(mat3(transpose(inverse(model))) * in_normal);
-                    frag_pos = vec3(model * vec4(in_position, 1.0));
-                }
-            """
-            
-            # Фрагментный шейдер
-            fragment_shader = """
-                #version 330 core
-                
-                uniform vec4 color;
-                
-                in vec3 normal;
-                in vec3 frag_pos;
-                
-                out vec4 fragColor;
-                
-                void main() {
-                    // Basic lighting for 2D
-                    float ambient_strength = 0.7;  // Увеличил ambient для лучшей видимости в 2D
-                    vec3 ambient = ambient_strength * vec3(1.0, 1.0, 1.0);
-                    
-                    // Simple directional light from top-right
-                    vec3 light_dir = normalize(vec3(1.0, 1.0, 0.5));
-                    float diff = max(dot(normal, light_dir), 0.0);
-                    vec3 diffuse = diff * vec3(0.5, 0.5, 0.5);
-                    
-                    // Combine lighting
-                    vec3 result = (ambient + diffuse) * color.rgb;
-                    
-                    // Output final color with alpha
-                    fragColor = vec4(result, color.a);
-                }
-            """
-            
-            return window_config.ctx.program(
-                vertex_shader=vertex_shader,
-                fragment_shader=fragment_shader
-            )
-        else:
-            raise ValueError(f"Unknown shader program: {name}")
-    
-    # Create VAO for the cube (for _wrap method)
-    @staticmethod
-    def create_cube_vao(window_config):
-        # Cube vertices (8 corners)
-        vertices = np.array([
-            # Front face
-            -0.5, -0.5,  0.5,  0.0,  0.0,  1.0,
-             0.5, -0.5,  0.5,  0.0,  0.0,  1.0,
-             0.5,  0.5,  0.5,  0.0,  0.0,  1.0,
-            -0.5,  0.5,  0.5,  0.0,  0.0,  1.0,
-            # Back face
-            -0.5, -0.5, -0.5,  0.0,  0.0, -1.0,
-             0.5, -0.5, -0.5,  0.0,  0.0, -1.0,
-             0.5,  0.5, -0.5,  0.0,  0.0, -1.0,
-            -0.5,  0.5, -0.5,  0.0,  0.0, -1.0,
-            # Top face
-            -0.5,  0.5, -0.5,  0.0,  1.0,  0.0,
-             0.5,  0.5, -0.5,  0.0,  1.0,  0.0,
-             0.5,  0.5,  0.5,  0.0,  1.0,  0.0,
-            -0.5,  0.5,  0.5,  0.0,  1.0,  0.0,
-            # Bottom face
-            -0.5, -0.5, -0.5,  0.0, -1.0,  0.0,
-             0.5, -0.5, -0.5,  0.0, -1.0,  0.0,
-             0.5, -0.5,  0.5,  0.0, -1.0,  0.0,
-            -0.5, -0.5,  0.5,  0.0, -1.0,  0.0,
-            # Right face
-             0.5, -0.5, -0.5,  1.0,  0.0,  0.0,
-             0.5,  0.5, -0.5,  1.0,  0.0,  0.0,
-             0.5,  0.5,  0.5,  1.0,  0.0,  0.0,
-             0.5, -0.5,  0.5,  1.0,  0.0,  0.0,
-            # Left face
-            -0.5, -0.5, -0.5, -1.0,  0.0,  0.0,
-            -0.5,  0.5, -0.5, -1.0,  0.0,  0.0,
-            -0.5,  0.5,  0.5, -1.0,  0.0,  0.0,
-            -0.5, -0.5,  0.5, -1.0,  0.0,  0.0,
-        ], dtype='f4')
-        
-        # Indices for drawing the 12 triangles (6 faces * 2 triangles)
-        indices = np.array([
-            0, 1, 2, 2, 3, 0,  # Front face
-            4, 5, 6, 6, 7, 4,  # Back face
-            8, 9, 10, 10, 11, 8,  # Top face
-            12, 13, 14, 14, 15, 12,  # Bottom face
-            16, 17, 18, 18, 19, 16,  # Right face
-            20, 21, 22, 22, 23, 20,  # Left face
-        ], dtype='i4')
-        
-        # Create VAO, VBO and EBO
-        vbo = window_config.ctx.buffer(vertices.tobytes())
-        ebo = window_config.ctx.buffer(indices.tobytes())
+    def offscreen(width=800, height=600, backend=None):
+        kwargs = {'backend': backend} if backend else {}
+        ctx = moderngl.create_standalone_context(require=330, **kwargs)
         
-        # Создаем шейдер, используя встроенные строки вместо файлов
-        shader = Renderer.load_program('cube', window_config)
-        
-        return window_config.ctx.vertex_array(
-            shader,
-            [
-                (vbo, '3f 3f', 'in_position', 'in_normal'),
-            ],
-            ebo
+        renderer = Renderer._from_context(ctx, None, width, height)
+        renderer.width = width
+        renderer.height = height
+        renderer.fbo = ctx.framebuffer(
+            color_attachments=[ctx.renderbuffer((width, height))],
+            depth_attachment=ctx.depth_renderbuffer((width, height))
         )
+        renderer.fbo.use()
+        renderer.set_projection(renderer.get_projection_matrix())
+        return renderer
+    
+    # Read the offscreen frame as an (H, W, 3) uint8 array, top row first
+    def read_frame(self):
+        target = self.fbo if self.fbo is not None else self.ctx.fbo
+        width, height = target.size
+        data = target.read(components=3)
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)[::-1]
+    
+    # Release the offscreen context and everything created on it
+    def release(self):
+        if self.fbo is None:
+            return
+        shader_registry.release_registry(self.ctx)
+        self.fbo.release()
+        self.fbo = None
+        self.ctx.release()
     
+    # Start recording rendered frames (see frame_capture.FrameCapture for options)
+    def start_capture(self, **kwargs):
+        from frame_capture import FrameCapture
+        
+        self.stop_capture()
+        target = self.fbo if self.fbo is not None else self.ctx.fbo
+        self.frame_capture = FrameCapture(target.size, **kwargs)
+        return self.frame_capture
+    
+    # Stop recording, returning capture statistics (or None if not recording)
+    def stop_capture(self):
+        if self.frame_capture is None:
+            return None
+        stats = self.frame_capture.stop()
+        self.frame_capture = None
+        return stats
+    
+    # Compiled program by name: compiled once per context through the shader registry
     def load_program(self, name):
-        # Больше не используем файлы шейдеров, вместо этого используем строковые константы
-        if name == 'cube':
-            # Вершинный шейдер
-            vertex_shader = """
-                #version 330 core
-                
-                uniform mat4 model;
-                uniform mat4 view;
-                uniform mat4 projection;
-                
-                in vec3 in_position;
-                in vec3 in_normal;
-                
-                out vec3 normal;
-                out vec3 frag_pos;
-                
-                void main() {
-                    // For 2D, we use the full transformation pipeline as usual
-                    gl_Position = projection * view * model * vec4(in_position, 1.0);
-                    
-                    // Pass normal and position to fragment shader (used for lighting)
-                    normal = normalize(mat3(transpose(inverse(model))) * in_normal);
-                    frag_pos = vec3(model * vec4(in_position, 1.0));
-                }
-            """
-            
-            # Фрагментный шейдер
-            fragment_shader = """
-                #version 330 core
-                
-                uniform vec4 color;
-                
-                in vec3 normal;
-                in vec3 frag_pos;
-                
-                out vec4 fragColor;
-                
-                void main() {
-                    // Basic lighting for 2D
-                    float ambient_strength = 0.7;  // Увеличил ambient для лучшей видимости в 2D
-                    vec3 ambient = ambient_strength * vec3(1.0, 1.0, 1.0);
-                    
-                    // Simple directional light from top-right
-                    vec3 light_dir = normalize(vec3(1.0, 1.0, 0.5));
-                    float diff = max(dot(normal, light_dir), 0.0);
-                    vec3 diffuse = diff * vec3(0.5, 0.5, 0.5);
-                    
-                    // Combine lighting
-                    vec3 result = (ambient + diffuse) * color.rgb;
-                    
-                    // Output final color with alpha
-                    fragColor = vec4(result, color.a);
-                }
-            """
-            
-            return self.ctx.program(
-                vertex_shader=vertex_shader,
-                fragment_shader=fragment_shader
-            )
-        else:
-            raise ValueError(f"Unknown shader program: {name}")
+        return shader_registry.get_registry(self.ctx, SHADER_SOURCES).get(name)
     
     # Create VAO for the cube
     def create_cube_vao(self):
         # Cube vertices (8 corners)
-        vertices = np.array([
-            # Front face
-            -0.5, -0.5,  0.5,  0.0,  0.0,  1.0,
-             0.5, -0.5,  0.5,  0.0,  0.0,  1.0,
-             0.5,  0.5,  0.5,  0.0,  0.0,  1.0,
-            -0.5,  0.5,  0.5,  0.0,  0.0,  1.0,
-            # Back face
-            -0.5, -0.5, -0.5,  0.0,  0.0, -1.0,
-             0.5, -0.5, -0.5,  0.0,  0.0, -1.0,
-             0.5,  0.5, -0.5,  0.0,  0.0, -1.0,
-            -0.5,  0.5, -0.5,  0.0,  0.0, -1.0,
-            # Top face
-            -0.5,  0.5, -0.5,  0.0,  1.0,  0.0,
-             0.5,  0.5, -0.5,  0.0,  1.0,  0.0,
-             0.5,  0.5,  0.5,  0.0,  1.0,  0.0,
-            -0.5,  0.5,  0.5,  0.0,  1.0,  0.0,
-            # Bottom face
-            -0.5, -0.5, -0.5,  0.0, -1.0,  0.0,
-             0.5, -0.5, -0.5,  0.0, -1.0,  0.0,
-             0.5, -0.5,  0.5,  0.0, -1.0,  0.0,
-            -0.5, -0.5,  0.5,  0.0, -1.0,  0.0,
-            # Right face
-             0.5, -0.5, -0.5,  1.0,  0.0,  0.0,
-             0.5,  0.5, -0.5,  1.0,  0.0,  0.0,
-             0.5,  0.5,  0.5,  1.0,  0.0,  0.0,
-             0.5, -0.5,  0.5,  1.0,  0.0,  0.0,
-            # Left face
-            -0.5, -0.5, -0.5, -1.0,  0.0,  0.0,
-            -0.5,  0.5, -0.5, -1.0,  0.0,  0.0,
-            -0.5,  0.5,  0.5, -1.0,  0.0,  0.0,
-            -0.5, -0.5,  0.5, -1.0,  0.0,  0.0,
-        ], dtype='f4')
+        vertices = CUBE_VERTICES
         
         # Indices for drawing the 12 triangles (6 faces * 2 triangles)
-        indices = np.array([
-            0, 1, 2, 2, 3, 0,  # Front face
-            4, 5, 6, 6, 7, 4,  # Back face
-            8, 9, 10, 10, 11, 8,  # Top face
-            12, 13, 14, 14, 15, 12,  # Bottom face
-            16, 17, 18, 18, 19, 16,  # Right face
-            20, 21, 22, 22, 23, 20,  # Left face
-        ], dtype='i4')
+        indices = CUBE_INDICES
         
         # Create VAO, VBO and EBO
         vbo = self.ctx.buffer(vertices.tobytes())
@@ -593,6 +550,237 @@ class Renderer(mglw.WindowConfig):
             ebo
         )
     
+    # Create the camera uniform buffer and the view/projection caches
+    def create_camera_uniforms(self):
+        self.camera_ubo = self.ctx.buffer(reserve=CAMERA_BLOCK_SIZE, dynamic=True)
+        self.camera_ubo.bind_to_uniform_block(CAMERA_BLOCK_BINDING)
+        self.camera_ubo_dirty = True
+        
+        # Матрица вида пересчитывается только после движения камеры
+        self.view_matrix = None
+        self.view_bytes = None
+        self.view_dirty = True
+    
+    # Attach a program's Camera block to the shared uniform buffer
+    def bind_camera_block(self, program):
+        program['Camera'].binding = CAMERA_BLOCK_BINDING
+    
+    # Set the projection matrix and cache its f4 bytes (on init and resize)
+    def set_projection(self, projection):
+        self.projection = projection
+        self.projection_bytes = matrix_bytes(projection)
+        self.camera_ubo_dirty = True
+    
+    # Mark the view matrix for recomputation after the camera moved
+    def mark_view_dirty(self):
+        self.view_dirty = True
+    
+    # Write the camera matrices to the uniform buffer if they changed (at most once per frame)
+    def update_camera_uniforms(self):
+        self.get_view_matrix()
+        if self.camera_ubo_dirty:
+            self.camera_ubo.write(self.view_bytes + self.projection_bytes)
+            self.camera_ubo_dirty = False
+    
+    # Create the instanced cube pipeline (shader, mesh buffers, per-instance buffer)
+    def create_instanced_pipeline(self, capacity=1024):
+        self.instance_shader = self.load_program('instanced_cube')
+        self.bind_camera_block(self.instance_shader)
+        self.instance_mesh_vbo = self.ctx.buffer(CUBE_VERTICES.tobytes())
+        self.instance_mesh_ebo = self.ctx.buffer(CUBE_INDICES.tobytes())
+        self.instance_buffer = None
+        self.instance_vao = None
+        self.instance_capacity = 0
+        self.instance_data = None
+        
+        # Кубы, переданные через draw_cube, копятся до flush_instances
+        self.pending_instances = []
+        
+        # Все отправленные за кадр пакеты рисуются в flush_render_queue
+        self.render_queue = RenderQueue()
+        self.reset_render_stats()
+        
+        self.reserve_instances(capacity)
+    
+    # Grow the per-instance buffer (2x) so it can hold `count` instances
+    def reserve_instances(self, count):
+        if count <= self.instance_capacity:
+            return
+        capacity = max(count, self.instance_capacity * 2)
+        
+        if self.instance_vao is not None:
+            self.instance_vao.release()
+            self.instance_buffer.release()
+        
+        self.instance_buffer = self.ctx.buffer(reserve=capacity * INSTANCE_FLOATS * 4, dynamic=True)
+        self.instance_vao = self.ctx.vertex_array(
+            self.instance_shader,
+            [
+                (self.instance_mesh_vbo, '3f 3f', 'in_position', 'in_normal'),
+                (self.instance_buffer, INSTANCE_FORMAT, 'in_offset', 'in_scale', 'in_color', 'in_rotation'),
+            ],
+            self.instance_mesh_ebo
+        )
+        self.instance_data = np.zeros((capacity, INSTANCE_FLOATS), dtype='f4')
+        self.instance_capacity = capacity
+    
+    # Queue many cubes for one instanced draw call
+    # positions (N, 3), scales (N, 3) or (N,), colors (N, 4) or (N, 3), rotations (N, 3) in degrees or None
+    def draw_instances(self, positions, scales, colors, rotations=None):
+        start = time.perf_counter()
+        
+        positions = np.asarray(positions, dtype='f4').reshape(-1, 3)
+        count = len(positions)
+        if count == 0:
+            return
+        self.reserve_instances(count)
+        
+        # Упаковываем все экземпляры в один массив и загружаем одним вызовом
+        data = self.instance_data[:count]
+        data[:, 0:3] = positions
+        data[:, 3:6] = np.asarray(scales, dtype='f4').reshape(count, -1)
+        colors = np.asarray(colors, dtype='f4').reshape(count, -1)
+        data[:, 6:6 + colors.shape[1]] = colors
+        if colors.shape[1] == 3:
+            data[:, 9] = 1.0
+        data[:, 10:13] = 0.0 if rotations is None else np.asarray(rotations, dtype='f4').reshape(count, 3)
+        self.draw_instance_data(data, start)
+    
+    # Queue an already packed (N, INSTANCE_FLOATS) float32 array
+    # Кубы с альфой < 1 уходят в прозрачный проход, остальные - в непрозрачный
+    def draw_instance_data(self, data, start=None):
+        if start is None:
+            start = time.perf_counter()
+        if len(data) == 0:
+            return
+        
+        translucent = data[:, 9] < 1.0
+        if not translucent.any():
+            self.render_queue.submit(PIPELINE_CUBES, data)
+        elif translucent.all():
+            self.render_queue.submit(PIPELINE_CUBES, data, transparent=True)
+        else:
+            self.render_queue.submit(PIPELINE_CUBES, data[~translucent])
+            self.render_queue.submit(PIPELINE_CUBES, data[translucent], transparent=True)
+        
+        self.render_stats['submit_ms'] += (time.perf_counter() - start) * 1000
+    
+    # Draw one cube batch with a single instanced call
+    def _draw_cube_batch(self, data):
+        count = len(data)
+        self.reserve_instances(count)
+        self.instance_buffer.write(np.ascontiguousarray(data, dtype='f4'))
+        self.instance_vao.render(instances=count)
+        
+        self.render_stats['draw_calls'] += 1
+        self.render_stats['instances'] += count
+    
+    # Create the particle sprite pipeline (shader, quad buffer, per-particle buffer)
+    def create_particle_pipeline(self, capacity=4096):
+        self.particle_shader = self.load_program('particle')
+        self.bind_camera_block(self.particle_shader)
+        self.particle_quad_vbo = self.ctx.buffer(PARTICLE_QUAD.tobytes())
+        self.particle_buffer = None
+        self.particle_vao = None
+        self.particle_capacity = 0
+        self.particle_data = None
+        
+        self.reserve_particles(capacity)
+    
+    # Grow the per-particle buffer (2x) so it can hold `count` particles
+    def reserve_particles(self, count):
+        if count <= self.particle_capacity:
+            return
+        capacity = max(count, self.particle_capacity * 2)
+        
+        if self.particle_vao is not None:
+            self.particle_vao.release()
+            self.particle_buffer.release()
+        
+        self.particle_buffer = self.ctx.buffer(reserve=capacity * PARTICLE_FLOATS * 4, dynamic=True)
+        self.particle_vao = self.ctx.vertex_array(
+            self.particle_shader,
+            [
+                (self.particle_quad_vbo, '2f', 'in_corner'),
+                (self.particle_buffer, PARTICLE_FORMAT, 'in_center', 'in_size', 'in_color'),
+            ]
+        )
+        self.particle_data = np.zeros((capacity, PARTICLE_FLOATS), dtype='f4')
+        self.particle_capacity = capacity
+    
+    # Queue particles as alpha-blended sprites (transparent pass)
+    # positions (N, 3), sizes (N,), colors (N, 4)
+    def draw_particles(self, positions, sizes, colors):
+        start = time.perf_counter()
+        count = len(positions)
+        if count == 0:
+            return
+        self.reserve_particles(count)
+        
+        # Упаковываем все частицы в один массив
+        data = self.particle_data[:count]
+        data[:, 0:3] = positions
+        data[:, 3] = sizes
+        data[:, 4:8] = colors
+        self.render_queue.submit(PIPELINE_PARTICLES, data, transparent=True)
+        
+        self.render_stats['submit_ms'] += (time.perf_counter() - start) * 1000
+    
+    # Draw one particle batch with a single instanced call
+    def _draw_particle_batch(self, data):
+        count = len(data)
+        self.reserve_particles(count)
+        self.particle_buffer.write(np.ascontiguousarray(data, dtype='f4'))
+        self.particle_vao.render(moderngl.TRIANGLE_STRIP, instances=count)
+        
+        self.render_stats['draw_calls'] += 1
+        self.render_stats['particles'] += count
+    
+    # Draw everything queued this frame: opaque pass first (no blending, one call per pipeline),
+    # then transparent pass back-to-front with alpha blending
+    def flush_render_queue(self):
+        if self.render_queue.is_empty():
+            return
+        start = time.perf_counter()
+        self.update_camera_uniforms()
+        draw_batch = {
+            PIPELINE_CUBES: self._draw_cube_batch,
+            PIPELINE_PARTICLES: self._draw_particle_batch,
+        }
+        
+        # Флаги DEPTH_TEST/BLEND вызывающего кода восстанавливаются при выходе из scope
+        # (blend_func в moderngl только для записи, его восстановить нельзя)
+        with self.ctx.scope(framebuffer=self.ctx.fbo):
+            self.ctx.enable(moderngl.DEPTH_TEST)
+            self.ctx.disable(moderngl.BLEND)
+            for pipeline, data in self.render_queue.opaque_batches():
+                draw_batch[pipeline](data)
+            
+            # Прозрачный проход: один вызов на серию одного конвейера в порядке глубины
+            self.ctx.enable(moderngl.BLEND)
+            self.ctx.blend_func = moderngl.SRC_ALPHA, moderngl.ONE_MINUS_SRC_ALPHA
+            for pipeline, data in self.render_queue.transparent_runs(self.get_view_matrix()):
+                draw_batch[pipeline](data)
+        
+        self.render_queue.clear()
+        self.render_stats['submit_ms'] += (time.perf_counter() - start) * 1000
+    
+    # Draw all cubes queued by draw_cube in one instanced call
+    def flush_instances(self):
+        if not self.pending_instances:
+            return
+        positions, scales, colors = zip(*self.pending_instances)
+        self.pending_instances.clear()
+        self.draw_instances(positions, scales, colors)
+    
+    # Reset per-frame draw statistics
+    def reset_render_stats(self):
+        self.render_stats = {'draw_calls': 0, 'instances': 0, 'particles': 0, 'submit_ms': 0.0}
+    
+    # Draw-call count, instance count and CPU submit time of the current frame
+    def get_render_stats(self):
+        return dict(self.render_stats)
+    
     # Handle mouse movement
     def mouse_position_event(self, x, y, dx, dy):
         if self.first_mouse:
@@ -636,6 +824,7 @@ class Renderer(mglw.WindowConfig):
         self.camera_right = self.camera_right / np.linalg.norm(self.camera_right)
         self.camera_up = np.cross(self.camera_right, self.camera_front)
         self.camera_up = self.camera_up / np.linalg.norm(self.camera_up)
+        self.mark_view_dirty()
     
     # Handle keyboard input
     def key_event(self, key, action, modifiers):
@@ -657,11 +846,17 @@ class Renderer(mglw.WindowConfig):
             self.camera_pos += camera_speed * self.camera_up
         if self.wnd.keys.LEFT_SHIFT in self.wnd.keys.key_states:
             self.camera_pos -= camera_speed * self.camera_up
+        self.mark_view_dirty()
     
-    # Get view matrix
+    # Get view matrix (cached until the camera moves)
     def get_view_matrix(self):
-        target = self.camera_pos + self.camera_front
-        return np.array(self.look_at(self.camera_pos, target, self.camera_up))
+        if self.view_dirty:
+            target = self.camera_pos + self.camera_front
+            self.view_matrix = np.array(self.look_at(self.camera_pos, target, self.camera_up))
+            self.view_bytes = matrix_bytes(self.view_matrix)
+            self.view_dirty = False
+            self.camera_ubo_dirty = True
+        return self.view_matrix
     
     # Get projection matrix
     def get_projection_matrix(self):
@@ -699,7 +894,7 @@ class Renderer(mglw.WindowConfig):
         
         return projection
     
-    # Load an OBJ model
+    # Load an OBJ model (VAO for the per-object 'cube' program, not the instanced path)
     def load_model_obj(self, obj_file):
         # For now, just return the existing cube VAO
         # In a real implementation, this would load and parse the OBJ file
@@ -718,34 +913,21 @@ class Renderer(mglw.WindowConfig):
         self.position = position
     
     # Draw a cube at a specific position with a specific size
+    # Compatibility wrapper: the cube is queued and drawn by flush_instances in one instanced call
     def draw_cube(self, position, size, color):
-        # Calculate model matrix
-        model = np.identity(4)
-        
-        # Translation
-        model[0, 3] = position[0]
-        model[1, 3] = position[1]
-        model[2, 3] = position[2]
-        
         # Scale - проверяем, является ли size списком или одиночным значением
         if isinstance(size, (list, tuple, np.ndarray)):
-            model[0, 0] = size[0]  # X scale
-            model[1, 1] = size[1]  # Y scale
-            model[2, 2] = size[2]  # Z scale
+            scale = (size[0], size[1], size[2])
         else:
             # Если size - скалярное значение, применяем его ко всем измерениям
-            model[0, 0] = size
-            model[1, 1] = size
-            model[2, 2] = size
+            scale = (size, size, size)
         
-        # Set uniforms
-        self.cube_shader["model"].write(model.astype('f4').tobytes())
-        self.cube_shader["view"].write(self.get_view_matrix().astype('f4').tobytes())
-        self.cube_shader["projection"].write(self.projection.astype('f4').tobytes())
-        self.cube_shader["color"].value = color
+        if len(color) == 3:
+            color = (color[0], color[1], color[2], 1.0)
         
-        # Draw the cube
-        self.cube_vao.render()
+        self.pending_instances.append(
+            ((position[0], position[1], position[2]), scale, tuple(color))
+        )
     
     # Create a look-at matrix
     def look_at(self, position, target, up):
@@ -809,7 +991,7 @@ class Renderer(mglw.WindowConfig):
         self.width = width
         self.height = height
         self.aspect_ratio = width / height
-        self.projection = self.get_projection_matrix()
+        self.set_projection(self.get_projection_matrix())
     
     # Создаем эффект частиц при столкновении
     def create_collision_particles(self, position, color, count=10):
@@ -822,18 +1004,25 @@ class Renderer(mglw.WindowConfig):
     
     # Render method with particle support
     def render(self, time, frame_time):
+        self.reset_render_stats()
+        self.update_camera_uniforms()
+        
         # Update particles
         self.update(frame_time)
         
         # Clear screen with gradient
         self.clear_screen()
         
-        # Set blend mode for transparency
-        self.ctx.enable(moderngl.BLEND)
-        self.ctx.blend_func = moderngl.SRC_ALPHA, moderngl.ONE_MINUS_SRC_ALPHA
-        
-        # Render all particles
+        # Кубы, накопленные через draw_cube, и частицы - в очередь отрисовки
+        self.flush_instances()
         self.particle_system.render()
+        
+        # Непрозрачный проход, затем прозрачный (от дальних к ближним)
+        self.flush_render_queue()
+        
+        # Запись кадра (копия в буфер пула, кодирование - в фоне)
+        if self.frame_capture is not None:
+            self.frame_capture.capture_framebuffer(self.fbo if self.fbo is not None else self.ctx.fbo)
 
 # Initialize the renderer
 def create_renderer():
@@ -0,0 +1,178 @@
+import os
+import struct
+import tempfile
+import zlib
+import numpy as np
+
+# Бинарный формат сохранения GameState
+# Файл = заголовок + колонки (по одной на каждое поле объекта), опционально сжатые zlib
+
+MAGIC = b'GCSV'
+VERSION = 1
+FLAG_COMPRESSED = 1
+
+# magic, version, flags, object count, score
+HEADER = struct.Struct('<4sHHIq')
+
+# Типы объектов GameState хранятся как коды
+OBJECT_TYPES = ['cube', 'collectible', 'moving_platform']
+OBJECT_TYPE_CODES = {name: code for code, name in enumerate(OBJECT_TYPES)}
+
+# Колонки каждой версии формата: (поле, dtype, ширина, значение по умолчанию)
+SCHEMAS = {
+    1: [
+        ('type', '<u1', 1, 0),
+        ('position', '<f4', 2, [0.0, 0.0]),
+        ('velocity', '<f4', 2, [0.0, 0.0]),
+        ('size', '<f4', 1, 1.0),
+        ('fixed', '<u1', 1, False),
+        ('active', '<u1', 1, True),
+        ('color', '<f4', 3, [0.8, 0.2, 0.2]),
+        ('rotation', '<f4', 1, 0.0),
+        ('rotation_speed', '<f4', 1, 0.0),
+        ('start_pos', '<f4', 2, [0.0, 0.0]),
+        ('end_pos', '<f4', 2, [0.0, 0.0]),
+        ('move_speed', '<f4', 1, 0.0),
+        ('move_dir', '<i1', 1, 1),
+        ('move_timer', '<f4', 1, 0.0),
+    ]
+}
+
+# Ошибка чтения бинарного сохранения
+class SaveFormatError(ValueError):
+    pass
+
+# Атомарная запись: пишем во временный файл и переименовываем,
+# чтобы сбой во время записи не испортил существующее сохранение
+def atomic_write(filename, data):
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+# Проверяем, является ли файл бинарным сохранением
+def is_binary_save(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+# Convert GameState object dicts to typed column arrays
+def objects_to_columns(objects):
+    count = len(objects)
+    columns = {}
+    for name, dtype, width, default in SCHEMAS[VERSION]:
+        if name == 'type':
+            values = [OBJECT_TYPE_CODES[obj['type']] for obj in objects]
+        else:
+            values = [obj.get(name, default) for obj in objects]
+        shape = (count, width) if width > 1 else (count,)
+        columns[name] = np.array(values, dtype=dtype).reshape(shape)
+    return columns
+
+# Коды типов вне OBJECT_TYPES означают поврежденный файл
+def check_type_codes(types, source="columns"):
+    types = np.asarray(types)
+    if len(types) and int(types.max()) >= len(OBJECT_TYPES):
+        raise SaveFormatError(f"{source}: unknown object type code {int(types.max())}")
+
+# Convert column arrays (of the given format version) back to GameState object dicts
+def columns_to_objects(columns, version=VERSION):
+    if version not in SCHEMAS:
+        raise SaveFormatError(f"unsupported save version {version}")
+    check_type_codes(columns['type'])
+    fields = {name: columns[name].tolist() for name, _, _, _ in SCHEMAS[version]}
+    objects = []
+    for i, type_code in enumerate(fields['type']):
+        obj_type = OBJECT_TYPES[type_code]
+        obj = {
+            'position': fields['position'][i],
+            'velocity': fields['velocity'][i],
+            'size': fields['size'][i],
+            'fixed': bool(fields['fixed'][i]),
+            'active': bool(fields['active'][i]),
+            'color': fields['color'][i],
+            'type': obj_type,
+            'rotation': fields['rotation'][i],
+            'rotation_speed': fields['rotation_speed'][i]
+        }
+        if obj_type == 'cube':
+            obj['acceleration'] = [0, 0]
+        elif obj_type == 'moving_platform':
+            obj['start_pos'] = fields['start_pos'][i]
+            obj['end_pos'] = fields['end_pos'][i]
+            obj['move_speed'] = fields['move_speed'][i]
+            obj['move_dir'] = fields['move_dir'][i]
+            obj['move_timer'] = fields['move_timer'][i]
+        objects.append(obj)
+    return objects
+
+# Кодируем колонки в байты файла сохранения
+def encode_columns(columns, score=0, compress=True):
+    count = len(columns['type'])
+    payload = b''.join(
+        np.ascontiguousarray(columns[name], dtype=dtype).tobytes()
+        for name, dtype, _, _ in SCHEMAS[VERSION]
+    )
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 1)
+        flags |= FLAG_COMPRESSED
+
+    return HEADER.pack(MAGIC, VERSION, flags, count, int(score)) + payload
+
+# Записываем колонки в файл
+def write_columns(filename, columns, score=0, compress=True):
+    atomic_write(filename, encode_columns(columns, score, compress))
+
+# Читаем колонки из файла прямо в массивы, без создания словарей
+# Возвращает (score, columns, version): версия из заголовка определяет схему колонок
+def read_columns(filename):
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        raise SaveFormatError(f"{filename}: truncated header")
+    magic, version, flags, count, score = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SaveFormatError(f"{filename}: not a binary save")
+    if version not in SCHEMAS:
+        raise SaveFormatError(f"{filename}: unsupported save version {version}")
+
+    payload = memoryview(data)[HEADER.size:]
+    if flags & FLAG_COMPRESSED:
+        try:
+            payload = zlib.decompress(payload)
+        except zlib.error as e:
+            raise SaveFormatError(f"{filename}: corrupted payload ({e})")
+
+    columns = {}
+    offset = 0
+    for name, dtype, width, _ in SCHEMAS[version]:
+        item_count = count * width
+        nbytes = item_count * np.dtype(dtype).itemsize
+        if offset + nbytes > len(payload):
+            raise SaveFormatError(f"{filename}: truncated column '{name}'")
+        column = np.frombuffer(payload, dtype=dtype, count=item_count, offset=offset)
+        columns[name] = column.reshape((count, width)) if width > 1 else column
+        offset += nbytes
+
+    check_type_codes(columns['type'], filename)
+    return score, columns, version
+
+# Сохраняем список объектов GameState в бинарный файл
+def save_objects(filename, objects, score=0, compress=True):
+    write_columns(filename, objects_to_columns(objects), score, compress)
+
+# Загружаем список объектов GameState из бинарного файла
+def load_objects(filename):
+    score, columns, version = read_columns(filename)
+    return score, columns_to_objects(columns, version)
@@ -0,0 +1,69 @@
+import hashlib
+
+# Реестр шейдерных программ
+# Исходники регистрируются по имени, программа компилируется один раз на контекст
+# и кэшируется по имени и хэшу исходников (изменение исходника дает новую программу)
+class ShaderRegistry:
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.sources = {}
+        self.programs = {}
+        self.stats = {'compiled': 0, 'hits': 0}
+
+    # Register (or replace) the sources of a named program
+    def register(self, name, vertex_shader, fragment_shader):
+        self.sources[name] = (vertex_shader, fragment_shader)
+
+    @staticmethod
+    def source_hash(vertex_shader, fragment_shader):
+        digest = hashlib.sha1()
+        digest.update(vertex_shader.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(fragment_shader.encode('utf-8'))
+        return digest.hexdigest()
+
+    # Compiled program for a registered name
+    def get(self, name):
+        if name not in self.sources:
+            raise ValueError(f"Unknown shader program: {name}")
+        vertex_shader, fragment_shader = self.sources[name]
+        key = (name, self.source_hash(vertex_shader, fragment_shader))
+
+        program = self.programs.get(key)
+        if program is not None:
+            self.stats['hits'] += 1
+            return program
+
+        program = self.ctx.program(
+            vertex_shader=vertex_shader,
+            fragment_shader=fragment_shader
+        )
+        self.programs[key] = program
+        self.stats['compiled'] += 1
+        return program
+
+    # Release all compiled programs (e.g. before the context is destroyed)
+    def release(self):
+        for program in self.programs.values():
+            program.release()
+        self.programs.clear()
+
+# Один реестр на контекст moderngl
+_registries = {}
+
+def get_registry(ctx, sources=None):
+    registry = _registries.get(id(ctx))
+    if registry is None or registry.ctx is not ctx:
+        registry = ShaderRegistry(ctx)
+        _registries[id(ctx)] = registry
+    if sources:
+        for name, (vertex_shader, fragment_shader) in sources.items():
+            if name not in registry.sources:
+                registry.register(name, vertex_shader, fragment_shader)
+    return registry
+
+# Drop the registry of a context that is being released
+def release_registry(ctx):
+    registry = _registries.pop(id(ctx), None)
+    if registry is not None:
+        registry.release()
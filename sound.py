@@ -1,5 +1,7 @@
 import pygame
 import os
+import time
+import heapq
 import config
 
 # Initialize sound system
@@ -145,4 +147,82 @@ def play_collision():
 
 def play_collectible():
     # Play collectible pickup sound
-    pass 
\ No newline at end of file
+    pass 
+
+# Имена глобальных переменных со звуками (заполняются в init)
+SOUND_GLOBALS = {
+    'collision': 'sound_collision',
+    'create_cube': 'sound_create_cube',
+    'collectible': 'sound_collectible'
+}
+
+# Play a loaded sound effect by name at the given volume (0.0 - 1.0)
+def play_sound(kind, volume=1.0):
+    sound_obj = globals().get(SOUND_GLOBALS.get(kind))
+    if sound_obj:
+        channel = sound_obj.play()
+        if channel is not None:
+            channel.set_volume(min(1.0, volume) * config.sound_volume)
+
+# Очередь звуковых событий
+# Игровая логика только публикует события, воспроизведение идет из одного места (dispatch),
+# поэтому число вызовов микшера за кадр не зависит от количества контактов
+class SoundEventQueue:
+    def __init__(self, player=None, max_events=None, min_intervals=None, min_impact=None):
+        self.player = player if player is not None else play_sound
+        self.max_events = max_events if max_events is not None else config.sound_max_events
+        self.min_intervals = min_intervals if min_intervals is not None else config.sound_min_intervals
+        self.min_impact = min_impact if min_impact is not None else config.sound_min_impact
+        self.last_played = {}
+        # kind -> min-heap самых громких событий кадра (не больше max_events на тип)
+        self.pending = {}
+
+    # Опубликовать событие; intensity - скорость удара (None - событие без удара, полная громкость)
+    def post(self, kind, intensity=None):
+        if not config.sound_enabled:
+            return
+        if intensity is None:
+            intensity = config.sound_full_impact
+        elif intensity < self.min_impact:
+            return
+        heap = self.pending.setdefault(kind, [])
+        if len(heap) < self.max_events:
+            heapq.heappush(heap, intensity)
+        elif intensity > heap[0]:
+            heapq.heapreplace(heap, intensity)
+
+    # Воспроизвести N самых громких событий кадра с учетом ограничения частоты по типу
+    def dispatch(self, now=None):
+        if not self.pending:
+            return 0
+        if now is None:
+            now = time.perf_counter()
+
+        candidates = []
+        for kind, heap in self.pending.items():
+            min_interval = self.min_intervals.get(kind, 0.0)
+            if now - self.last_played.get(kind, -min_interval) < min_interval:
+                continue
+            candidates.extend((intensity, kind) for intensity in heap)
+        self.pending.clear()
+
+        played = heapq.nlargest(self.max_events, candidates)
+        for intensity, kind in played:
+            self.last_played[kind] = now
+            self.player(kind, intensity / config.sound_full_impact)
+        return len(played)
+
+    # Сбросить накопленные события без воспроизведения
+    def clear(self):
+        self.pending.clear()
+
+# Общая очередь событий для игровых модулей
+events = SoundEventQueue()
+
+# Publish a gameplay sound event
+def post_event(kind, intensity=None):
+    events.post(kind, intensity)
+
+# Dispatch the frame's sound events (call once per frame)
+def dispatch_events():
+    return events.dispatch()
@@ -0,0 +1,400 @@
+import random
+import json
+import os
+import numpy as np
+import taichi as ti
+import config
+import sound
+import save_format
+import game_state
+
+# Коды типов совпадают с кодами бинарного формата сохранения
+TYPE_CUBE = save_format.OBJECT_TYPE_CODES['cube']
+TYPE_COLLECTIBLE = save_format.OBJECT_TYPE_CODES['collectible']
+TYPE_MOVING_PLATFORM = save_format.OBJECT_TYPE_CODES['moving_platform']
+
+# Taichi-бэкенд GameState: те же правила и публичный API,
+# но update выполняется скомпилированными ядрами над полями
+@ti.data_oriented
+class TaichiGameState:
+    def __init__(self, capacity=None):
+        self.capacity = capacity if capacity is not None else config.taichi_max_objects
+        n = self.capacity
+
+        # Поля объектов (структура массивов)
+        self.position = ti.Vector.field(2, dtype=ti.f32, shape=n)
+        self.velocity = ti.Vector.field(2, dtype=ti.f32, shape=n)
+        self.size = ti.field(dtype=ti.f32, shape=n)
+        self.fixed = ti.field(dtype=ti.i32, shape=n)
+        self.active = ti.field(dtype=ti.i32, shape=n)
+        self.color = ti.Vector.field(3, dtype=ti.f32, shape=n)
+        self.obj_type = ti.field(dtype=ti.i32, shape=n)
+        self.rotation = ti.field(dtype=ti.f32, shape=n)
+        self.rotation_speed = ti.field(dtype=ti.f32, shape=n)
+        self.start_pos = ti.Vector.field(2, dtype=ti.f32, shape=n)
+        self.end_pos = ti.Vector.field(2, dtype=ti.f32, shape=n)
+        self.move_speed = ti.field(dtype=ti.f32, shape=n)
+        self.move_dir = ti.field(dtype=ti.i32, shape=n)
+        self.move_timer = ti.field(dtype=ti.f32, shape=n)
+
+        # Накопители поправок для столкновений (схема Якоби, без гонок)
+        self.delta_pos = ti.Vector.field(2, dtype=ti.f32, shape=n)
+        self.delta_vel = ti.Vector.field(2, dtype=ti.f32, shape=n)
+
+        self.count = ti.field(dtype=ti.i32, shape=())
+        self.max_impact = ti.field(dtype=ti.f32, shape=())
+
+        # Python-копия счетчика, чтобы не читать поле при каждом создании
+        self.object_count = 0
+
+        self.score = 0
+        self.game_over = False
+
+        # Физические константы
+        self.gravity = 9.8
+        self.friction = 0.98
+        self.bounce_factor = 0.7
+
+        # Фоновое автосохранение (включается через enable_autosave, см. create_game_state)
+        self.autosaver = None
+
+        self.add_initial_cubes()
+
+    # Add initial cubes for testing
+    def add_initial_cubes(self):
+        game_state.add_initial_objects(self)
+
+    # Reset game state
+    def reset(self):
+        self.score = 0
+        self.game_over = False
+        self.object_count = 0
+        self.count[None] = 0
+        self.add_initial_cubes()
+
+    # Update score
+    def update_score(self, points=1):
+        self.score += points
+        return self.score
+
+    @ti.kernel
+    def _add_object(self, x: ti.f32, y: ti.f32, vx: ti.f32, vy: ti.f32, obj_size: ti.f32,
+                    fixed: ti.i32, r: ti.f32, g: ti.f32, b: ti.f32, obj_type: ti.i32,
+                    rotation_speed: ti.f32, end_x: ti.f32, end_y: ti.f32,
+                    move_speed: ti.f32) -> ti.i32:
+        index = self.count[None]
+        self.count[None] += 1
+        self.position[index] = ti.Vector([x, y])
+        self.velocity[index] = ti.Vector([vx, vy])
+        self.size[index] = obj_size
+        self.fixed[index] = fixed
+        self.active[index] = 1
+        self.color[index] = ti.Vector([r, g, b])
+        self.obj_type[index] = obj_type
+        self.rotation[index] = 0.0
+        self.rotation_speed[index] = rotation_speed
+        self.start_pos[index] = ti.Vector([x, y])
+        self.end_pos[index] = ti.Vector([end_x, end_y])
+        self.move_speed[index] = move_speed
+        self.move_dir[index] = 1
+        self.move_timer[index] = 0.0
+        return index
+
+    def _create(self, position, velocity, size, fixed, color, obj_type,
+                rotation_speed=0.0, end_pos=None, move_speed=0.0):
+        if self.object_count >= self.capacity:
+            print(f"Warning: object capacity ({self.capacity}) reached")
+            return -1
+        if end_pos is None:
+            end_pos = position
+        self.object_count += 1
+        return self._add_object(position[0], position[1], velocity[0], velocity[1], size,
+                                int(fixed), color[0], color[1], color[2], obj_type,
+                                rotation_speed, end_pos[0], end_pos[1], move_speed)
+
+    # Create cube at given position
+    # Возвращает индекс объекта (он же 'id' в словарях self.cubes), а не словарь, как GameState;
+    # -1, если достигнута емкость полей
+    def create_cube(self, position, velocity=None, size=1.0, fixed=False, color=None):
+        if velocity is None:
+            velocity = [0, 0]
+        if color is None:
+            color = [0.8, 0.2, 0.2]
+        index = self._create(position, velocity, size, fixed, color, TYPE_CUBE,
+                             random.uniform(-1.0, 1.0) * 50.0)
+        if index < 0:
+            return index
+        sound.post_event('create_cube')
+        return index
+
+    # Add a static platform
+    def add_platform(self, position, size=10.0, color=None):
+        if color is None:
+            color = [0.3, 0.3, 0.8]
+        return self.create_cube(position, [0, 0], size, fixed=True, color=color)
+
+    # Create collectible item (coin)
+    def create_collectible(self, position):
+        return self._create(position, [0, 0], 0.3, False, [1.0, 0.9, 0.1],
+                            TYPE_COLLECTIBLE, 90.0)
+
+    # Create moving platform
+    def create_moving_platform(self, position, endpoints, size=2.0):
+        end_pos = [position[0] + endpoints[0], position[1] + endpoints[1]]
+        return self._create(position, [0, 0], size, True, [0.2, 0.7, 0.4],
+                            TYPE_MOVING_PLATFORM, 0.0, end_pos, 2.0)
+
+    # Проверка, находится ли куб на платформе (как GameState.is_cube_on_platform)
+    @ti.func
+    def _on_platform(self, c, p):
+        horizontal_distance = ti.abs(self.position[c][0] - self.position[p][0])
+        vertical_distance = self.position[c][1] - self.position[p][1]
+        result = 0
+        if (horizontal_distance < (self.size[c] + self.size[p]) / 2 * 0.8 and
+                vertical_distance > 0 and
+                vertical_distance < self.size[c] / 2 + self.size[p] / 2 + 0.1):
+            result = 1
+        return result
+
+    @ti.kernel
+    def _move_platforms(self, dt: ti.f32):
+        n = self.count[None]
+        for p in range(n):
+            if self.active[p] == 1 and self.obj_type[p] == TYPE_MOVING_PLATFORM:
+                direction = self.move_dir[p]
+                step = direction * self.move_speed[p] * dt
+                new_x = self.position[p][0] + step
+
+                # Проверяем, достигли ли конечной точки
+                if direction > 0:
+                    if new_x >= self.end_pos[p][0]:
+                        new_x = self.end_pos[p][0]
+                        self.move_dir[p] = -1
+                else:
+                    if new_x <= self.start_pos[p][0]:
+                        new_x = self.start_pos[p][0]
+                        self.move_dir[p] = 1
+                self.position[p][0] = new_x
+
+                # Перемещаем все объекты, стоящие на платформе (атомарное сложение)
+                for c in range(n):
+                    if c != p and self.active[c] == 1 and self.fixed[c] == 0:
+                        if self._on_platform(c, p) == 1:
+                            self.position[c][0] += step
+
+    @ti.kernel
+    def _integrate(self, dt: ti.f32, gravity: ti.f32, friction: ti.f32, bounce: ti.f32):
+        for i in range(self.count[None]):
+            if self.active[i] == 1 and self.fixed[i] == 0:
+                v = self.velocity[i]
+                v[1] -= gravity * dt
+                v *= friction
+                p = self.position[i] + v * dt
+                self.rotation[i] += self.rotation_speed[i] * dt
+
+                half = self.size[i] / 2
+                # Check floor collision
+                if p[1] - half < -10:
+                    p[1] = -10 + half
+                    v[1] = -v[1] * bounce
+                # Check walls collision
+                if p[0] - half < -15:
+                    p[0] = -15 + half
+                    v[0] = -v[0] * bounce
+                elif p[0] + half > 15:
+                    p[0] = 15 - half
+                    v[0] = -v[0] * bounce
+
+                self.position[i] = p
+                self.velocity[i] = v
+
+    @ti.kernel
+    def _collide(self, bounce: ti.f32):
+        n = self.count[None]
+        self.max_impact[None] = 0.0
+        for i in range(n):
+            self.delta_pos[i] = ti.Vector([0.0, 0.0])
+            self.delta_vel[i] = ti.Vector([0.0, 0.0])
+
+        # Каждый подвижный объект считает только свою поправку,
+        # парная поправка считается симметрично в итерации другого объекта
+        for i in range(n):
+            if self.active[i] == 1 and self.fixed[i] == 0:
+                for j in range(n):
+                    if j != i and self.active[j] == 1:
+                        d = self.position[i] - self.position[j]
+                        distance = d.norm()
+                        combined_size = (self.size[i] + self.size[j]) / 2
+                        if distance < combined_size:
+                            normal = ti.Vector([0.0, 1.0])
+                            if distance > 0:
+                                normal = d / distance
+                            else:
+                                angle = ti.random() * 2 * 3.14159265
+                                normal = ti.Vector([ti.cos(angle), ti.sin(angle)])
+                            overlap = combined_size - distance
+
+                            if self.fixed[j] == 1:
+                                self.delta_pos[i] += normal * overlap
+                                dot_product = self.velocity[i].dot(normal)
+                                if dot_product < 0:
+                                    self.delta_vel[i] -= 2 * dot_product * normal * bounce
+                                    ti.atomic_max(self.max_impact[None], -dot_product)
+                            else:
+                                weight = self.size[j] / (self.size[i] + self.size[j])
+                                self.delta_pos[i] += normal * overlap * weight
+                                vel_along_normal = (self.velocity[i] - self.velocity[j]).dot(normal)
+                                if vel_along_normal <= 0:
+                                    mass1 = self.size[i] ** 3
+                                    mass2 = self.size[j] ** 3
+                                    impulse = -(1 + bounce) * vel_along_normal / (1 / mass1 + 1 / mass2)
+                                    jitter = ti.Vector([ti.random() - 0.5, ti.random() - 0.5]) * 0.02
+                                    self.delta_vel[i] += impulse * normal / mass1 + jitter
+                                    ti.atomic_max(self.max_impact[None], -vel_along_normal)
+
+        for i in range(n):
+            self.position[i] += self.delta_pos[i]
+            self.velocity[i] += self.delta_vel[i]
+
+    # Сбор монеток; возвращает число собранных за кадр
+    @ti.kernel
+    def _collect(self) -> ti.i32:
+        n = self.count[None]
+        collected = 0
+        for i in range(n):
+            if self.active[i] == 1 and self.fixed[i] == 0 and self.obj_type[i] == TYPE_CUBE:
+                for j in range(n):
+                    if self.active[j] == 1 and self.obj_type[j] == TYPE_COLLECTIBLE:
+                        distance = (self.position[i] - self.position[j]).norm()
+                        if distance < (self.size[i] + self.size[j]) / 2:
+                            # Монетку забирает только первый куб
+                            if ti.atomic_and(self.active[j], 0) == 1:
+                                collected += 1
+        return collected
+
+    @ti.kernel
+    def _count_dynamic_cubes(self) -> ti.i32:
+        total = 0
+        for i in range(self.count[None]):
+            if self.active[i] == 1 and self.fixed[i] == 0 and self.obj_type[i] == TYPE_CUBE:
+                total += 1
+        return total
+
+    # Включить периодическое автосохранение в фоновом потоке
+    def enable_autosave(self, directory=None, interval=None, retention=None):
+        from autosave import Autosaver
+
+        if self.autosaver is not None:
+            self.autosaver.stop()
+        self.autosaver = Autosaver(directory, interval, retention)
+        print(f"Автосохранение каждые {self.autosaver.interval:g} с в {os.path.abspath(self.autosaver.directory)}")
+        return self.autosaver
+
+    # Снимок для автосохранения: (score, make_columns), см. GameState.snapshot
+    # to_columns уже копирует поля в массивы, словари объектов не создаются
+    def snapshot(self):
+        columns = self.to_columns()
+        return self.score, lambda: columns
+
+    # Update the game state
+    def update(self, dt):
+        # Автосохранение по таймеру (запись идет в фоне)
+        if self.autosaver is not None:
+            self.autosaver.update(dt, self)
+
+        if self.game_over:
+            return
+
+        self._move_platforms(dt)
+        self._integrate(dt, self.gravity, self.friction, self.bounce_factor)
+        self._collide(self.bounce_factor)
+
+        collected = self._collect()
+        if collected > 0:
+            self.update_score(10 * collected)
+            sound.post_event('collectible')
+
+        # Один звук столкновения с силой самого сильного удара кадра
+        sound.post_event('collision', self.max_impact[None])
+
+        self.check_game_over()
+        sound.dispatch_events()
+
+    # Check game over conditions
+    def check_game_over(self):
+        if self._count_dynamic_cubes() == 0:
+            self.game_over = True
+
+    # Поля, соответствующие колонкам формата сохранения
+    def column_fields(self):
+        return {
+            'type': self.obj_type, 'position': self.position, 'velocity': self.velocity,
+            'size': self.size, 'fixed': self.fixed, 'active': self.active,
+            'color': self.color, 'rotation': self.rotation,
+            'rotation_speed': self.rotation_speed, 'start_pos': self.start_pos,
+            'end_pos': self.end_pos, 'move_speed': self.move_speed,
+            'move_dir': self.move_dir, 'move_timer': self.move_timer
+        }
+
+    # Выгрузить поля в колонки формата сохранения
+    def to_columns(self):
+        n = self.object_count
+        fields = self.column_fields()
+        return {
+            name: fields[name].to_numpy()[:n].astype(dtype)
+            for name, dtype, _, _ in save_format.SCHEMAS[save_format.VERSION]
+        }
+
+    # Загрузить колонки формата сохранения в поля
+    def load_columns(self, columns):
+        n = len(columns['type'])
+        if n > self.capacity:
+            raise ValueError(f"save has {n} objects, capacity is {self.capacity}")
+        for name, field in self.column_fields().items():
+            data = np.zeros_like(field.to_numpy())
+            data[:n] = columns[name]
+            field.from_numpy(data)
+        self.count[None] = n
+        self.object_count = n
+
+    # Копия объектов в виде словарей GameState (для сохранения в JSON и отладки)
+    @property
+    def cubes(self):
+        objects = save_format.columns_to_objects(self.to_columns())
+        for index, obj in enumerate(objects):
+            obj['id'] = index
+        return objects
+
+    # Сохранить состояние в файл
+    def save_state(self, filename='save.txt', binary=None):
+        if binary is None:
+            binary = config.save_binary
+
+        if binary:
+            save_format.write_columns(filename, self.to_columns(), self.score, config.save_compress)
+        else:
+            json_data = json.dumps({'score': self.score, 'cubes': self.cubes})
+            save_format.atomic_write(filename, json_data.encode('utf-8'))
+
+        print(f"Состояние сохранено в {filename}")
+
+    # Загрузить состояние из файла (формат определяется по заголовку)
+    def load_state(self, filename='save.txt'):
+        try:
+            if save_format.is_binary_save(filename):
+                score, columns, _ = save_format.read_columns(filename)
+            else:
+                with open(filename, 'r') as f:
+                    data = json.load(f)
+                score = data['score']
+                columns = save_format.objects_to_columns(data['cubes'])
+
+            self.load_columns(columns)
+            self.score = score
+            self.game_over = False
+
+            print(f"Состояние загружено из {filename}")
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ошибка при загрузке состояния из {filename}: {e}")
+            return False
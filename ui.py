@@ -89,20 +89,21 @@ def draw_ui(window, mouse_pos):
         
         # Кнопки для выбора куба
         gui.text("Cubes:")
+        # Целевые зоны для всех кубов одним запросом
+        zone_ids, _ = cube_manager.query_target_zones()
         for i in range(count):
             is_active = (cube_manager.cube_active[i] == 1)
             color = cube_manager.cube_colors[i]
             color_text = f"[{color[0]:.1f}, {color[1]:.1f}, {color[2]:.1f}]"
             
             # Проверяем, находится ли куб в целевой зоне
-            in_target = cube_manager.is_cube_in_target_zone(i)
+            in_target = zone_ids[i] >= 0
             target_text = "(Target!)" if in_target else ""
             
             button_text = f"Select cube {i+1} {color_text} {target_text} {'(Active)' if is_active else ''}"
             if gui.button(button_text):
                 # Делаем выбранный куб активным, остальные - неактивными
-                for j in range(count):
-                    cube_manager.cube_active[j] = 1 if j == i else 0
+                cube_manager.select_cube(i)
         
         # Звуковые настройки
         gui.text("Sound:")
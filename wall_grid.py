@@ -0,0 +1,121 @@
+import numpy as np
+
+# Статическая структура ускорения для проверок столкновений со стенами
+# Стены задаются как [x1, y1, x2, y2]; id стены - ее индекс в массиве
+
+# Id стены в результатах запросов: нет столкновения / внешняя граница поля
+NO_WALL = -1
+FIELD_WALL = -2
+
+# Uniform grid over wall bounding boxes (expanded by wall thickness)
+# Each cell stores the ids of walls overlapping it, so a query only tests nearby walls
+class WallGrid:
+    def __init__(self, walls, thickness, field_width, field_height, cell_size=None, max_cells_per_axis=256):
+        self.walls = np.asarray(walls, dtype=np.float32).reshape(-1, 4)
+        self.thickness = float(thickness)
+
+        # Границы поля считаются один раз
+        self.field_min_x = (1.0 - field_width) / 2.0
+        self.field_max_x = self.field_min_x + field_width
+        self.field_min_y = (1.0 - field_height) / 2.0
+        self.field_max_y = self.field_min_y + field_height
+
+        # Стены как кортежи Python: скалярные сравнения с ними быстрее, чем с элементами numpy
+        self.wall_list = [tuple(float(v) for v in wall) for wall in self.walls]
+
+        # AABB стен с запасом в толщину стены: куб вне этого прямоугольника стену не задевает
+        lower = np.minimum(self.walls[:, :2], self.walls[:, 2:]) - self.thickness
+        upper = np.maximum(self.walls[:, :2], self.walls[:, 2:]) + self.thickness
+        self.box_list = [tuple(float(v) for v in box) for box in np.concatenate([lower, upper], axis=1)]
+
+        # Прямоугольники стен в той же геометрии, что и у check: [x1, x2] x [min(y) - t/2, max(y) + t/2]
+        # Куб задевает стену в check, только когда пересекает этот прямоугольник, поэтому swept-проверка
+        # против него не пропускает позиции, на которых check сработает. Наклонные стены
+        # (и стены с x1 > x2) check никогда не задевает - для swept-проверки они отключены
+        wx1, wy1, wx2, wy2 = self.walls[:, 0], self.walls[:, 1], self.walls[:, 2], self.walls[:, 3]
+        self.sweep_boxes = np.stack([wx1, np.minimum(wy1, wy2) - self.thickness / 2,
+                                     wx2, np.maximum(wy1, wy2) + self.thickness / 2], axis=1)
+        self.sweepable = (((np.abs(wx1 - wx2) < self.thickness) | (np.abs(wy1 - wy2) < self.thickness)) &
+                          (wx1 <= wx2))
+
+        if len(self.walls) == 0:
+            self.origin = (0.0, 0.0)
+            self.cell_size = 1.0
+            self.dims = (1, 1)
+            self.cells = [()]
+            return
+
+        grid_lower = lower.min(axis=0)
+        grid_upper = upper.max(axis=0)
+
+        # По умолчанию ячейка - медианная длина стены
+        if cell_size is None:
+            cell_size = float(np.median((upper - lower).max(axis=1)))
+        extent = max(float((grid_upper - grid_lower).max()), 1e-6)
+        cell_size = max(cell_size, extent / max_cells_per_axis, 1e-6)
+
+        self.origin = (float(grid_lower[0]), float(grid_lower[1]))
+        self.cell_size = cell_size
+        self.dims = tuple(int(d) for d in np.maximum(np.ceil((grid_upper - grid_lower) / cell_size), 1))
+
+        # Раскладываем стены по ячейкам (только при построении)
+        cells = [[] for _ in range(self.dims[0] * self.dims[1])]
+        for wall_id in range(len(self.walls)):
+            x0, y0 = self._cell_coords(lower[wall_id, 0], lower[wall_id, 1])
+            x1, y1 = self._cell_coords(upper[wall_id, 0], upper[wall_id, 1])
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cells[cx * self.dims[1] + cy].append(wall_id)
+        self.cells = [tuple(cell) for cell in cells]
+
+    def _cell_coords(self, x, y):
+        cx = int((x - self.origin[0]) // self.cell_size)
+        cy = int((y - self.origin[1]) // self.cell_size)
+        return (min(max(cx, 0), self.dims[0] - 1), min(max(cy, 0), self.dims[1] - 1))
+
+    # Ids of walls whose cells overlap the box [min_x, max_x] x [min_y, max_y]
+    def candidates(self, min_x, min_y, max_x, max_y):
+        x0, y0 = self._cell_coords(min_x, min_y)
+        x1, y1 = self._cell_coords(max_x, max_y)
+        if x0 == x1 and y0 == y1:
+            return self.cells[x0 * self.dims[1] + y0]
+
+        found = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                found.update(self.cells[cx * self.dims[1] + cy])
+        return sorted(found)
+
+    # Проверка столкновения куба со стенами поля и ближайшими внутренними стенами
+    def check(self, x, y, size):
+        half = size / 2
+        cube_min_x = x - half
+        cube_max_x = x + half
+        cube_min_y = y - half
+        cube_max_y = y + half
+
+        # Проверка столкновения с внешними стенами
+        if (cube_min_x <= self.field_min_x or cube_max_x >= self.field_max_x or
+            cube_min_y <= self.field_min_y or cube_max_y >= self.field_max_y):
+            return True
+
+        thickness = self.thickness
+        for wall_id in self.candidates(cube_min_x, cube_min_y, cube_max_x, cube_max_y):
+            wx1, wy1, wx2, wy2 = self.wall_list[wall_id]
+
+            # Проверяем только если стена и куб пересекаются
+            if not ((wx1 <= cube_max_x and wx2 >= cube_min_x) and
+                    (min(wy1, wy2) - thickness/2 <= cube_max_y and max(wy1, wy2) + thickness/2 >= cube_min_y)):
+                continue
+
+            # Вертикальная стена
+            if abs(wx1 - wx2) < thickness:
+                if abs(cube_min_x - wx1) < thickness or abs(cube_max_x - wx1) < thickness:
+                    return True
+
+            # Горизонтальная стена
+            if abs(wy1 - wy2) < thickness:
+                if abs(cube_min_y - wy1) < thickness or abs(cube_max_y - wy1) < thickness:
+                    return True
+
+        return False
@@ -0,0 +1,108 @@
+import numpy as np
+import taichi as ti
+
+# Поле расстояний со знаком (SDF) для стен уровня
+# Значение > 0 - свободное место внутри поля, < 0 - внутри стены или за границей поля
+# Сетка узлов (R, R) покрывает прямоугольник поля field_bounds, индексы [ix, iy];
+# позиции вне поля при выборке прижимаются к его границе
+# Выборка есть в двух вариантах: WallSDF.sample (NumPy) и sample_sdf (ti.func для ядер)
+
+# Максимум элементов в промежуточных массивах (узлы x стены) при запекании
+BAKE_CELLS = 1 << 20
+
+# Signed distance from points (N, 2) to axis-aligned boxes (W, 4), negative inside, (N, W)
+def box_distance(points, boxes):
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    halves = (boxes[:, 2:] - boxes[:, :2]) / 2
+    q = np.abs(points[:, None, :] - centers[None, :, :]) - halves[None, :, :]
+    outside = np.sqrt((np.maximum(q, 0.0) ** 2).sum(axis=2))
+    inside = np.minimum(q.max(axis=2), 0.0)
+    return outside + inside
+
+class WallSDF:
+    # boxes - (W, 4) прямоугольники стен [min_x, min_y, max_x, max_y] (как WallGrid.sweep_boxes),
+    # field_bounds - [min_x, min_y, max_x, max_y] свободной области поля
+    def __init__(self, boxes, field_bounds, resolution=256):
+        self.resolution = max(2, int(resolution))
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        field = np.asarray(field_bounds, dtype=np.float32).reshape(1, 4)
+
+        # Узлы на единицу длины по каждой оси (поле может быть не квадратным)
+        self.origin = field[0, :2].copy()
+        extent = np.maximum(field[0, 2:] - field[0, :2], 1e-6)
+        self.scale = (self.resolution - 1) / extent
+
+        axis_x = np.linspace(field[0, 0], field[0, 2], self.resolution, dtype=np.float32)
+        axis_y = np.linspace(field[0, 1], field[0, 3], self.resolution, dtype=np.float32)
+        gx, gy = np.meshgrid(axis_x, axis_y, indexing='ij')
+        points = np.stack([gx.ravel(), gy.ravel()], axis=1)
+
+        # Граница поля: свободна внутренняя часть рамки, поэтому знак обратный
+        values = -box_distance(points, field)[:, 0]
+
+        # Внутренние стены запекаются блоками, чтобы ограничить память
+        if len(boxes):
+            step = max(1, BAKE_CELLS // len(boxes))
+            for begin in range(0, len(points), step):
+                rows = slice(begin, begin + step)
+                values[rows] = np.minimum(values[rows], box_distance(points[rows], boxes).min(axis=1))
+
+        self.values = values.reshape(self.resolution, self.resolution).astype(np.float32)
+        self.field = None
+        self.transform = None
+
+    # Bilinear lookup: distances (N,) and gradients (N, 2) for positions (N, 2)
+    def sample(self, positions):
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        limit = float(self.resolution - 1)
+        u = np.clip((positions - self.origin) * self.scale, 0.0, limit)
+        i0 = np.minimum(u.astype(np.int64), self.resolution - 2)
+        f = u - i0
+        fx, fy = f[:, 0], f[:, 1]
+        ix, iy = i0[:, 0], i0[:, 1]
+
+        v00 = self.values[ix, iy]
+        v10 = self.values[ix + 1, iy]
+        v01 = self.values[ix, iy + 1]
+        v11 = self.values[ix + 1, iy + 1]
+
+        distances = (v00 * (1 - fx) * (1 - fy) + v10 * fx * (1 - fy) +
+                     v01 * (1 - fx) * fy + v11 * fx * fy)
+        gradients = np.empty_like(positions)
+        gradients[:, 0] = ((v10 - v00) * (1 - fy) + (v11 - v01) * fy) * self.scale[0]
+        gradients[:, 1] = ((v01 - v00) * (1 - fx) + (v11 - v10) * fx) * self.scale[1]
+        return distances, gradients
+
+    # Taichi-поля с теми же данными (создаются один раз) для sample_sdf в ядрах:
+    # значения (R, R) и преобразование [origin_x, origin_y, scale_x, scale_y]
+    def to_field(self):
+        if self.field is None:
+            self.field = ti.field(dtype=ti.f32, shape=self.values.shape)
+            self.field.from_numpy(self.values)
+            self.transform = ti.Vector.field(4, dtype=ti.f32, shape=())
+            self.transform[None] = [float(self.origin[0]), float(self.origin[1]),
+                                    float(self.scale[0]), float(self.scale[1])]
+        return self.field, self.transform
+
+# Bilinear lookup in a Taichi SDF field (see WallSDF.to_field), returns [distance, grad_x, grad_y]
+@ti.func
+def sample_sdf(sdf: ti.template(), transform: ti.template(), pos):
+    origin = ti.Vector([transform[None][0], transform[None][1]])
+    scale = ti.Vector([transform[None][2], transform[None][3]])
+    limit = ti.cast(sdf.shape[0] - 1, ti.f32)
+    u = ti.math.clamp((pos - origin) * scale, 0.0, limit)
+    ix = ti.min(ti.cast(u[0], ti.i32), sdf.shape[0] - 2)
+    iy = ti.min(ti.cast(u[1], ti.i32), sdf.shape[1] - 2)
+    fx = u[0] - ix
+    fy = u[1] - iy
+
+    v00 = sdf[ix, iy]
+    v10 = sdf[ix + 1, iy]
+    v01 = sdf[ix, iy + 1]
+    v11 = sdf[ix + 1, iy + 1]
+
+    distance = (v00 * (1 - fx) * (1 - fy) + v10 * fx * (1 - fy) +
+                v01 * (1 - fx) * fy + v11 * fx * fy)
+    grad_x = ((v10 - v00) * (1 - fy) + (v11 - v01) * fy) * scale[0]
+    grad_y = ((v01 - v00) * (1 - fx) + (v11 - v10) * fx) * scale[1]
+    return ti.Vector([distance, grad_x, grad_y])
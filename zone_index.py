@@ -0,0 +1,88 @@
+import numpy as np
+
+# Запросы "в какой круглой зоне находится точка" для многих точек и зон сразу
+# Зоны задаются как [x, y, radius]; id зоны - ее индекс в списке
+
+# Brute-force query: tests every point against every zone, returns first zone id per point (-1 if none)
+def query_zones(positions, zones):
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+    zones = np.asarray(zones, dtype=np.float32).reshape(-1, 3)
+    if len(zones) == 0 or len(positions) == 0:
+        return np.full(len(positions), -1, dtype=np.int32)
+
+    # Квадраты расстояний до центров всех зон, (N, Z)
+    d2 = ((positions[:, None, :] - zones[None, :, :2]) ** 2).sum(axis=2)
+    inside = d2 <= zones[None, :, 2] ** 2
+    return np.where(inside.any(axis=1), inside.argmax(axis=1), -1).astype(np.int32)
+
+# Count points per zone from per-point zone ids
+def zone_occupancy(zone_ids, zone_count):
+    return np.bincount(zone_ids[zone_ids >= 0], minlength=zone_count)
+
+# Uniform grid over zone bounding boxes
+# Each cell stores the ids of zones overlapping it, so a query only tests nearby zones
+class ZoneIndex:
+    def __init__(self, zones, cell_size=None, max_cells_per_axis=256):
+        self.zones = np.asarray(zones, dtype=np.float32).reshape(-1, 3)
+        centers = self.zones[:, :2]
+        radii = self.zones[:, 2]
+
+        if len(self.zones) == 0:
+            self.origin = np.zeros(2, dtype=np.float32)
+            self.cell_size = 1.0
+            self.dims = np.ones(2, dtype=np.int64)
+            self.table = np.full((1, 1), -1, dtype=np.int32)
+            return
+
+        lower = (centers - radii[:, None]).min(axis=0)
+        upper = (centers + radii[:, None]).max(axis=0)
+
+        # По умолчанию ячейка - диаметр типичной зоны
+        if cell_size is None:
+            cell_size = float(np.median(radii)) * 2
+        extent = max(float((upper - lower).max()), 1e-6)
+        cell_size = max(cell_size, extent / max_cells_per_axis, 1e-6)
+
+        self.origin = lower
+        self.cell_size = cell_size
+        self.dims = np.maximum(np.ceil((upper - lower) / cell_size).astype(np.int64), 1)
+
+        # Раскладываем зоны по ячейкам (только при построении)
+        cells = [[] for _ in range(int(self.dims[0] * self.dims[1]))]
+        first_cells = self._cell_coords(centers - radii[:, None])
+        last_cells = self._cell_coords(centers + radii[:, None])
+        for zone_id in range(len(self.zones)):
+            x0, y0 = first_cells[zone_id]
+            x1, y1 = last_cells[zone_id]
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cells[cx * self.dims[1] + cy].append(zone_id)
+
+        # Плотная таблица (ячейка, K) с заполнением -1; id в ячейке идут по возрастанию
+        width = max(1, max(len(cell) for cell in cells))
+        self.table = np.full((len(cells), width), -1, dtype=np.int32)
+        for cell_id, cell in enumerate(cells):
+            self.table[cell_id, :len(cell)] = cell
+
+    def _cell_coords(self, points):
+        coords = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(coords, 0, self.dims - 1)
+
+    # First zone id per point (-1 if none), testing only zones of the point's cell
+    def query(self, positions):
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        count = len(positions)
+        if count == 0 or len(self.zones) == 0:
+            return np.full(count, -1, dtype=np.int32)
+
+        # Точки вне сетки попадают в крайние ячейки и отсеиваются проверкой расстояния
+        coords = self._cell_coords(positions)
+        candidates = self.table[coords[:, 0] * self.dims[1] + coords[:, 1]]  # (N, K)
+        valid = candidates >= 0
+        safe = np.where(valid, candidates, 0)
+
+        d2 = ((positions[:, None, :] - self.zones[safe, :2]) ** 2).sum(axis=2)
+        inside = valid & (d2 <= self.zones[safe, 2] ** 2)
+
+        first = candidates[np.arange(count), inside.argmax(axis=1)]
+        return np.where(inside.any(axis=1), first, -1).astype(np.int32)